@@ -0,0 +1,157 @@
+import bisect
+import math
+import time
+from dataclasses import replace
+from itertools import accumulate
+from typing import Callable
+
+from PySide6.QtCore import QCoreApplication, QObject, Qt, QTimer
+from PySide6.QtGui import QScreen
+
+from sprites import Frame
+
+# Called when its frame is due; returns ms until its next frame, or None
+# once it has nothing more to show.
+TickFn = Callable[[], "int | None"]
+
+
+# QTimer may fire up to a millisecond early
+TIMER_SLACK_MS = 1
+
+# Assumed display refresh rate when the screen does not report one
+FALLBACK_HZ = 60
+
+
+def now_ms() -> float:
+    return time.monotonic() * 1000.0
+
+
+def refresh_ms(screen: QScreen | None) -> float:
+    """Time between display refreshes on screen."""
+    hz = screen.refreshRate() if screen is not None else 0
+    return 1000.0 / (hz if hz > 0 else FALLBACK_HZ)
+
+
+def same_picture(a: Frame, b: Frame) -> bool:
+    if a.patches or b.patches:
+        return False
+    return (
+        a.pixmap.cacheKey() == b.pixmap.cacheKey()
+        and a.rect == b.rect
+        and a.offset == b.offset
+    )
+
+
+def coalesce(frames: list[Frame], default_ms: int) -> list[Frame]:
+    """
+    Merge runs of frames showing the same picture into one frame held for
+    their combined duration, so nothing wakes up just to redraw it.
+    Every returned frame has an explicit duration.
+    """
+    out: list[Frame] = []
+    for frame in frames:
+        ms = frame.duration or default_ms * frame.ticks
+        if out and same_picture(out[-1], frame):
+            out[-1] = replace(out[-1], duration=out[-1].duration + ms)
+        else:
+            out.append(replace(frame, duration=ms))
+    return out
+
+
+class Timeline:
+    """
+    Which frame of a sequence is due at a given monotonic time. Frame
+    numbers count up from 0 across loops (frame k shows sequence entry
+    k % len), so playback stays locked to the clock however late ticks
+    arrive. Time spent paused does not count.
+    """
+
+    def __init__(self, durations: list[int], loop: bool, start: float | None = None):
+        self.ends = list(accumulate(durations))
+        self.total = self.ends[-1]
+        self.loop = loop
+        self.start = now_ms() if start is None else start
+        self.paused_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def position(self, now: float) -> int | None:
+        """Frame number due at now, or None once a one-shot sequence is over."""
+        elapsed = max(0.0, now - self.start)
+        cycle, into = divmod(elapsed, self.total)
+        if cycle and not self.loop:
+            return None
+        return int(cycle) * len(self.ends) + bisect.bisect_right(self.ends, into)
+
+    def frame_end(self, pos: int) -> float:
+        """Monotonic time at which frame number pos gives way to the next."""
+        cycle, i = divmod(pos, len(self.ends))
+        return self.start + cycle * self.total + self.ends[i]
+
+    def pause(self, now: float):
+        if self.paused_at is None:
+            self.paused_at = now
+
+    def resume(self, now: float):
+        if self.paused_at is not None:
+            self.start += now - self.paused_at
+            self.paused_at = None
+
+
+class FrameScheduler(QObject):
+    """
+    One single-shot timer for every animation in the process. It sleeps
+    until the earliest registered frame change, runs the callbacks that are
+    due and re-arms for the next one; with nothing registered it does not
+    wake at all.
+    """
+
+    _shared: "FrameScheduler | None" = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._due: dict[TickFn, float] = {}
+        self.wakeups = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._fire)
+
+    @classmethod
+    def shared(cls) -> "FrameScheduler":
+        if cls._shared is None:
+            cls._shared = cls(QCoreApplication.instance())
+        return cls._shared
+
+    def schedule(self, tick: TickFn, delay_ms: float):
+        self._due[tick] = now_ms() + delay_ms
+        self._arm()
+
+    def cancel(self, tick: TickFn):
+        if self._due.pop(tick, None) is not None:
+            self._arm()
+
+    def is_scheduled(self, tick: TickFn) -> bool:
+        return tick in self._due
+
+    def _arm(self):
+        if not self._due:
+            self._timer.stop()
+            return
+        wait = min(self._due.values()) - now_ms()
+        self._timer.start(max(0, math.ceil(wait)))
+
+    def _fire(self):
+        self.wakeups += 1
+        now = now_ms()
+        for tick, due in list(self._due.items()):
+            if due > now + TIMER_SLACK_MS or self._due.get(tick) != due:
+                continue
+            del self._due[tick]
+            delay = tick()
+            if delay is not None and tick not in self._due:
+                # Delays are measured from when the callback ran
+                self._due[tick] = now_ms() + delay
+        self._arm()
@@ -0,0 +1,288 @@
+"""
+Headless benchmark for Buddy: startup, asset loading, per-frame cost,
+idle wakeups and memory. Runs under Qt's offscreen platform, so it needs
+no display, and prints one JSON document so builds can be compared.
+
+    python benchmark.py -o bench.json
+    python benchmark.py --assets-root build/   # another asset layout
+"""
+import os
+import sys
+
+# Must be set before Qt creates its platform integration
+os.environ["QT_QPA_PLATFORM"] = "offscreen"
+
+import argparse
+import contextlib
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+from PySide6 import __version__ as pyside_version
+from PySide6.QtCore import QEvent, QEventLoop, QPointF, Qt, QTimer
+from PySide6.QtGui import QImage, QMouseEvent, QPainter, QPixmap
+from PySide6.QtWidgets import QApplication
+
+import main as buddy_app
+from animation import FrameScheduler
+from sprites import FrameStore
+
+
+def rss_kb() -> int | None:
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def run_for(ms: int):
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec()
+
+
+class ProbeBuddy(buddy_app.Buddy):
+    """Buddy that records when it first finishes painting."""
+
+    first_paint: float | None = None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint is None and self.frame is not None:
+            self.first_paint = time.perf_counter()
+
+
+def bench_first_paint(app: QApplication) -> tuple[dict, ProbeBuddy]:
+    start = time.perf_counter()
+    buddy = ProbeBuddy()
+    built = time.perf_counter()
+    buddy.show()
+    while buddy.first_paint is None and time.perf_counter() - start < 10:
+        app.processEvents(QEventLoop.AllEvents, 10)
+    result = {
+        "construct_ms": (built - start) * 1000,
+        "first_paint_ms": (buddy.first_paint - start) * 1000 if buddy.first_paint else None,
+    }
+    return result, buddy
+
+
+def bench_asset_load(names: list[str]) -> dict:
+    # A fresh store with room for everything, so nothing is evicted
+    store = FrameStore(buddy_app.resource_path("assets"), 1 << 40)
+    per_anim = {}
+    start = time.perf_counter()
+    for name in names:
+        t = time.perf_counter()
+        frames = store.get(name)
+        per_anim[name] = {"ms": (time.perf_counter() - t) * 1000, "frames": len(frames)}
+    total = (time.perf_counter() - start) * 1000
+    store.deleteLater()
+    return {"total_ms": total, "animations": per_anim}
+
+
+def bench_ticks(app: QApplication, buddy: buddy_app.Buddy, loops: int) -> dict:
+    """
+    Cost of one frame change per animation: composing the next frame and
+    painting the damaged area, with the scheduler and clock bypassed.
+    """
+    buddy.behavior_timer.stop()
+    results = {}
+    for name in buddy.anim_names:
+        if not buddy.play(name, loop=True):
+            continue
+        buddy.scheduler.cancel(buddy.tick_anim)
+        app.processEvents()
+
+        samples: list[float] = []
+        for _ in range(loops * len(buddy.current_frames)):
+            t = time.perf_counter()
+            buddy.advance_to(buddy.anim_pos + 1)
+            app.processEvents()
+            samples.append((time.perf_counter() - t) * 1e6)
+
+        samples.sort()
+        results[name] = {
+            "frames": len(buddy.current_frames),
+            "mean_us": statistics.fmean(samples),
+            "p95_us": samples[int(len(samples) * 0.95)],
+            "max_us": samples[-1],
+        }
+    buddy.play("idle", loop=True)
+    return results
+
+
+def bench_idle_wakeups(app: QApplication, buddy: buddy_app.Buddy, seconds: float) -> dict:
+    buddy.behavior_timer.stop()
+    buddy.play("idle", loop=True)
+    scheduler = FrameScheduler.shared()
+    before = scheduler.wakeups
+    dropped = buddy.dropped_frames
+    # Only frames shown during this run count, not those of earlier benchmarks
+    buddy.frame_times.clear()
+    run_for(int(seconds * 1000))
+    wakeups = scheduler.wakeups - before
+    return {
+        "seconds": seconds,
+        "wakeups": wakeups,
+        "per_second": wakeups / seconds,
+        "dropped_frames": buddy.dropped_frames - dropped,
+        "effective_fps": len(buddy.frame_times) / seconds,
+        "frame_cap_ms": buddy.min_frame_ms,
+    }
+
+
+def bench_drag(app: QApplication, buddy: buddy_app.Buddy, seconds: float, hz: int) -> dict:
+    """
+    Drag the buddy with synthetic pointer events at hz (a gaming mouse is
+    1000) and count how many window moves that turns into, and how long
+    the oldest pending pointer event waits for its move.
+    """
+    def send(kind, local: QPointF, buttons):
+        event = QMouseEvent(kind, local, buddy.mapToGlobal(local), Qt.LeftButton, buttons, Qt.NoModifier)
+        app.sendEvent(buddy, event)
+
+    grab = QPointF(buddy.frame_rect.center())
+    send(QEvent.MouseButtonPress, grab, Qt.LeftButton)
+    moves = buddy.drag_moves
+    buddy.drag_latency.clear()
+
+    events = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        if events < elapsed * hz:
+            events += 1
+            # A slow circle, so every event has a new target
+            send(QEvent.MouseMove, grab + QPointF(events % 40, events // 40 % 40), Qt.LeftButton)
+        app.processEvents()
+    send(QEvent.MouseButtonRelease, grab, Qt.NoButton)
+
+    latency = sorted(buddy.drag_latency)
+    moved = buddy.drag_moves - moves
+    return {
+        "seconds": seconds,
+        "pointer_events": events,
+        "window_moves": moved,
+        "moves_per_second": moved / seconds,
+        "refresh_hz": round(1000 / buddy.refresh_ms(), 1),
+        "latency_mean_ms": statistics.fmean(latency) if latency else None,
+        "latency_p95_ms": latency[int(len(latency) * 0.95)] if latency else None,
+        "latency_max_ms": latency[-1] if latency else None,
+    }
+
+
+def bench_blits(names: list[str], loops: int) -> dict:
+    """
+    Per animation: the formats its pixmaps are stored in, whether they all
+    match the backbuffer's (the blit fast path: a plain copy, no format
+    conversion) and the cost of one frame blit. straight_alpha_blit_us is
+    the same blits from unpremultiplied ARGB32, for comparison.
+    """
+    store = FrameStore(buddy_app.resource_path("assets"), 1 << 40)
+    target = QPixmap(*store.canvas_size(names))
+    target.fill(Qt.transparent)
+    native = target.toImage().format()
+
+    def time_blits(sources, draw) -> float:
+        painter = QPainter(target)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        start = time.perf_counter()
+        for _ in range(loops):
+            for source, rect in sources:
+                draw(painter, source, rect)
+        painter.end()
+        return (time.perf_counter() - start) * 1e6 / (loops * len(sources))
+
+    per_anim = {}
+    for name in names:
+        pieces = []
+        for frame in store.get(name):
+            if frame.patches:
+                pieces.extend((patch.pixmap, patch.rect) for patch in frame.patches)
+            else:
+                pieces.append((frame.pixmap, frame.rect))
+        formats = {pix.toImage().format() for pix, _ in pieces}
+        straight = [(pix.toImage().convertToFormat(QImage.Format_ARGB32), rect) for pix, rect in pieces]
+        per_anim[name] = {
+            "formats": sorted(f.name for f in formats),
+            "fast_path": formats <= {native, QImage.Format_RGB32},
+            "blit_us": time_blits(pieces, lambda p, pix, rect: p.drawPixmap(0, 0, pix, rect.x(), rect.y(), rect.width(), rect.height())),
+            "straight_alpha_blit_us": time_blits(straight, lambda p, img, rect: p.drawImage(0, 0, img, rect.x(), rect.y(), rect.width(), rect.height())),
+        }
+    store.deleteLater()
+    return {"backbuffer_format": native.name, "animations": per_anim}
+
+
+def bench_memory(names: list[str]) -> dict:
+    store = FrameStore(buddy_app.resource_path("assets"), 1 << 40)
+    per_anim = {}
+    for name in names:
+        rss = rss_kb()
+        pixels = store.resident_bytes()
+        store.get(name)
+        after = rss_kb()
+        per_anim[name] = {
+            "rss_kb": after - rss if rss is not None and after is not None else None,
+            "pixel_kb": (store.resident_bytes() - pixels) // 1024,
+        }
+    result = {"animations": per_anim, "total_pixel_kb": store.resident_bytes() // 1024}
+    store.deleteLater()
+    return result
+
+
+def run(args) -> dict:
+    if args.assets_root is not None:
+        buddy_app.BASE_DIR = args.assets_root.resolve()
+
+    rss_start = rss_kb()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    startup, buddy = bench_first_paint(app)
+    names = buddy.anim_names
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "pyside": pyside_version,
+            "platform": platform.platform(),
+            "assets": str(buddy_app.resource_path("assets")),
+        },
+        "startup": startup,
+        "asset_load": bench_asset_load(names),
+        "ticks": bench_ticks(app, buddy, args.loops),
+        "blits": bench_blits(names, args.loops),
+        "idle": bench_idle_wakeups(app, buddy, args.idle_seconds),
+        "drag": bench_drag(app, buddy, args.drag_seconds, args.drag_hz),
+        "memory": {"rss_start_kb": rss_start, **bench_memory(names)},
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Headless Buddy benchmark (JSON output).")
+    parser.add_argument("-o", "--output", type=Path, help="write JSON here instead of stdout")
+    parser.add_argument("--assets-root", type=Path,
+                        help="folder containing the assets/ directory to benchmark")
+    parser.add_argument("--loops", type=int, default=5,
+                        help="times to run through each animation when timing ticks")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--drag-seconds", type=float, default=1.0)
+    parser.add_argument("--drag-hz", type=int, default=1000,
+                        help="rate of synthetic pointer events while dragging")
+    args = parser.parse_args(argv)
+
+    # Keep the app's own prints out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args)
+
+    report = json.dumps(result, indent=1)
+    if args.output is not None:
+        args.output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PySide6.QtCore import QCoreApplication, QPointF, QRect, QRectF, QSize, Qt
+from PySide6.QtGui import QColor, QFont, QPainter, QPixmap, QTextLayout, QTextOption
+
+PADDING_X = 10
+PADDING_Y = 8
+RADIUS = 10
+BACKGROUND = QColor(255, 255, 255, 235)
+TEXT_COLOR = QColor(Qt.black)
+
+
+@dataclass(frozen=True)
+class BubbleLayout:
+    """Text wrapped once for a bubble; reveals clip it, they never re-wrap."""
+    key: tuple
+    text: str
+    layout: QTextLayout
+    size: QSize       # whole bubble, padding included
+
+
+class BubbleRenderer:
+    """
+    Speech bubbles drawn without widgets or style sheets. Text layouts and
+    finished bubble pixmaps are cached by text, font and width, so a repeated
+    message costs a dictionary lookup. A bubble can also be revealed a few
+    characters at a time onto a blank one, drawing only the new glyphs.
+    """
+
+    _shared: "BubbleRenderer | None" = None
+
+    def __init__(self, cache_size: int = 64):
+        self.cache_size = cache_size
+        self._layouts: OrderedDict[tuple, BubbleLayout] = OrderedDict()
+        self._pixmaps: OrderedDict[tuple, QPixmap] = OrderedDict()
+
+    @classmethod
+    def shared(cls) -> "BubbleRenderer":
+        if cls._shared is None:
+            cls._shared = cls()
+            app = QCoreApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(cls._shared.clear)
+        return cls._shared
+
+    def clear(self):
+        self._layouts.clear()
+        self._pixmaps.clear()
+
+    def _cached(self, cache: OrderedDict, key: tuple, make):
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = make()
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return value
+
+    def layout(self, text: str, font: QFont, max_width: int) -> BubbleLayout:
+        key = (text, font.key(), max_width)
+        return self._cached(self._layouts, key, lambda: self._make_layout(key, text, font, max_width))
+
+    def _make_layout(self, key: tuple, text: str, font: QFont, max_width: int) -> BubbleLayout:
+        layout = QTextLayout(text, font)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+
+        line_width = max(1, max_width - 2 * PADDING_X)
+        text_w = 0.0
+        y = 0.0
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(line_width)
+            line.setPosition(QPointF(PADDING_X, PADDING_Y + y))
+            y += line.height()
+            text_w = max(text_w, line.naturalTextWidth())
+        layout.endLayout()
+
+        size = QSize(int(text_w + 0.999) + 2 * PADDING_X, int(y + 0.999) + 2 * PADDING_Y)
+        return BubbleLayout(key, text, layout, size)
+
+    def blank(self, bubble: BubbleLayout, dpr: float = 1.0) -> QPixmap:
+        """The bubble with no text yet; copy it before revealing onto it."""
+        return self._cached(self._pixmaps, (bubble.key, dpr, False), lambda: self._make_blank(bubble, dpr))
+
+    def pixmap(self, bubble: BubbleLayout, dpr: float = 1.0) -> QPixmap:
+        """The finished bubble."""
+        def make():
+            pix = self.blank(bubble, dpr).copy()
+            self.reveal(pix, bubble, 0, len(bubble.text))
+            return pix
+        return self._cached(self._pixmaps, (bubble.key, dpr, True), make)
+
+    def _make_blank(self, bubble: BubbleLayout, dpr: float) -> QPixmap:
+        pix = QPixmap(bubble.size * dpr)
+        pix.setDevicePixelRatio(dpr)
+        pix.fill(Qt.transparent)
+        painter = QPainter(pix)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(BACKGROUND)
+        painter.drawRoundedRect(QRectF(0, 0, bubble.size.width(), bubble.size.height()), RADIUS, RADIUS)
+        painter.end()
+        return pix
+
+    def reveal(self, pix: QPixmap, bubble: BubbleLayout, start: int, end: int) -> QRect:
+        """
+        Draw characters [start, end) of the text onto pix and return the
+        area that changed. Each line is clipped at character boundaries,
+        with the first and last pieces running to the bubble's edges, so
+        revealing in steps puts down exactly the pixels of a single pass.
+        """
+        layout = bubble.layout
+        w, h = bubble.size.width(), bubble.size.height()
+        count = layout.lineCount()
+        changed = QRect()
+
+        painter = QPainter(pix)
+        painter.setPen(TEXT_COLOR)
+        for i in range(count):
+            line = layout.lineAt(i)
+            first = line.textStart()
+            last = first + line.textLength()
+            if last <= start or first >= end:
+                continue
+
+            x0 = 0.0 if start <= first else line.cursorToX(start)[0]
+            x1 = float(w) if end >= last else line.cursorToX(end)[0]
+            top = 0.0 if i == 0 else line.y()
+            bottom = float(h) if i == count - 1 else layout.lineAt(i + 1).y()
+
+            clip = QRectF(x0, top, x1 - x0, bottom - top)
+            painter.setClipRect(clip)
+            line.draw(painter, QPointF(0, 0))
+            changed = changed.united(clip.toAlignedRect())
+        painter.end()
+        return changed
@@ -0,0 +1,120 @@
+"""
+Adaptive frame-rate governor: trades animation smoothness for battery and
+CPU when the machine is on battery or busy, and gives it back when it is
+on AC and quiet again.
+"""
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+POWER_SUPPLY_DIR = Path("/sys/class/power_supply")
+POLL_MS = 30 * 1000
+
+# 1-minute load average per CPU above which the machine counts as busy,
+# and below which it counts as quiet again
+HIGH_LOAD = 0.8
+LOW_LOAD = 0.5
+
+# level -> (frame rate cap, 0 for none; multiplier on the random-action interval)
+LEVELS = {
+    "full": (0, 1.0),
+    "reduced": (5, 2.0),
+    "low": (3, 3.0),
+}
+
+
+def _read(path: Path) -> str:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return ""
+
+
+def on_battery(root: Path = POWER_SUPPLY_DIR) -> bool:
+    """
+    True when running from a battery: some mains supply is reported offline
+    or some battery is discharging. Machines without power supply info
+    (desktops, VMs, non-Linux) count as on AC.
+    """
+    if not root.is_dir():
+        return False
+    mains_online = None
+    discharging = False
+    for supply in root.iterdir():
+        kind = _read(supply / "type")
+        if kind == "Mains":
+            mains_online = bool(mains_online) or _read(supply / "online") == "1"
+        elif kind == "Battery" and _read(supply / "scope") != "Device":
+            discharging = discharging or _read(supply / "status") == "Discharging"
+    return discharging or mains_online is False
+
+
+def load_per_cpu() -> float:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
+
+
+class Governor(QObject):
+    """
+    Polls power and load every POLL_MS and sets each registered buddy's
+    frame rate cap and action interval to match. A busy machine stays
+    "busy" until its load drops below LOW_LOAD, so the level does not
+    flap around the threshold. Polling stops while suspended.
+    """
+
+    changed = Signal(str)
+
+    def __init__(self, root: Path = POWER_SUPPLY_DIR, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.level = "full"
+        self.battery = False
+        self.busy = False
+        self.load = 0.0
+        self.suspended = False
+        self._buddies: list = []
+
+        self._poll = QTimer(self)
+        self._poll.setTimerType(Qt.VeryCoarseTimer)
+        self._poll.timeout.connect(self.update)
+        self._poll.start(POLL_MS)
+        self.update()
+
+    def add(self, buddy):
+        self._buddies.append(buddy)
+        buddy.destroyed.connect(lambda: self._buddies.remove(buddy))
+        self._apply(buddy)
+
+    def set_suspended(self, suspended: bool):
+        """Stop polling while the buddies are suspended; catch up at once on resume."""
+        if suspended == self.suspended:
+            return
+        self.suspended = suspended
+        if suspended:
+            self._poll.stop()
+        else:
+            self.update()
+            self._poll.start(POLL_MS)
+
+    def max_fps(self) -> int:
+        return LEVELS[self.level][0]
+
+    def update(self):
+        self.battery = on_battery(self.root)
+        self.load = load_per_cpu()
+        self.busy = self.load >= (LOW_LOAD if self.busy else HIGH_LOAD)
+
+        level = "low" if self.battery and self.busy else "reduced" if self.battery or self.busy else "full"
+        if level == self.level:
+            return
+        self.level = level
+        for buddy in self._buddies:
+            self._apply(buddy)
+        self.changed.emit(level)
+
+    def _apply(self, buddy):
+        fps, action_scale = LEVELS[self.level]
+        buddy.set_governed(1000.0 / fps if fps else 0.0, action_scale)
@@ -0,0 +1,192 @@
+"""
+Power-aware lifecycle: buddies stop all their timers while nobody can see
+them. Buddy itself pauses when hidden; Lifecycle adds the session side
+(screen locked, user away, a fullscreen app in front) from a
+SessionProvider.
+
+No provider here detects fullscreen apps yet. Expose tracking does not
+stand in for it: the buddy is an always-on-top tool window, so nothing
+covers it, and Qt does not report occlusion on X11 anyway. A provider
+could answer fullscreen() from the EWMH _NET_ACTIVE_WINDOW and its
+_NET_WM_STATE_FULLSCREEN state on X11.
+"""
+from PySide6.QtCore import SLOT, QObject, Qt, QTimer, Signal, Slot
+
+try:
+    from PySide6.QtDBus import QDBusConnection, QDBusInterface
+except ImportError:
+    QDBusConnection = None
+
+# Suspend once the user has not touched keyboard or mouse for this long
+IDLE_AFTER_MS = 10 * 60 * 1000
+# How often to look for the user coming back while suspended for idleness
+IDLE_RETURN_CHECK_MS = 5 * 1000
+
+
+class SessionProvider(QObject):
+    """
+    Session state as seen by Lifecycle. The base class describes a session
+    that is never locked, idle or fullscreen. Subclasses emit changed
+    whenever any of the answers may have changed.
+    """
+
+    changed = Signal()
+
+    def locked(self) -> bool:
+        return False
+
+    def idle_ms(self) -> int:
+        """Time since the last keyboard or mouse input, or 0 if unknown."""
+        return 0
+
+    def fullscreen(self) -> bool:
+        """True while another application is fullscreen on top."""
+        return False
+
+
+class FakeSessionProvider(SessionProvider):
+    """A session driven by hand, for tests and experiments."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._locked = False
+        self._idle_ms = 0
+        self._fullscreen = False
+
+    def locked(self) -> bool:
+        return self._locked
+
+    def idle_ms(self) -> int:
+        return self._idle_ms
+
+    def fullscreen(self) -> bool:
+        return self._fullscreen
+
+    def set_locked(self, locked: bool):
+        self._locked = locked
+        self.changed.emit()
+
+    def set_idle_ms(self, ms: int):
+        self._idle_ms = ms
+        self.changed.emit()
+
+    def set_fullscreen(self, fullscreen: bool):
+        self._fullscreen = fullscreen
+        self.changed.emit()
+
+
+class DBusSessionProvider(SessionProvider):
+    """
+    Lock and idle state from the freedesktop ScreenSaver service on the
+    session bus (GNOME, KDE, XFCE and others provide it). The screensaver
+    turning on counts as locked. Fullscreen apps are not reported (see the
+    module docstring), so fullscreen() is always False.
+    """
+
+    SERVICE = "org.freedesktop.ScreenSaver"
+    PATH = "/org/freedesktop/ScreenSaver"
+
+    def __init__(self, parent=None, bus=None):
+        super().__init__(parent)
+        self._locked = False
+        self._iface = None
+        if QDBusConnection is None:
+            return
+        if bus is None:
+            bus = QDBusConnection.sessionBus()
+        if not bus.isConnected():
+            return
+        iface = QDBusInterface(self.SERVICE, self.PATH, self.SERVICE, bus)
+        if not iface.isValid():
+            return
+        # Without change signals the lock state would go stale; leave it to
+        # default_provider to fall back instead
+        try:
+            connected = bus.connect(self.SERVICE, self.PATH, self.SERVICE, "ActiveChanged",
+                                    self, SLOT("_on_active_changed(bool)"))
+        except (TypeError, RuntimeError):
+            connected = False
+        if not connected:
+            return
+        self._iface = iface
+        reply = iface.call("GetActive")
+        if reply.arguments():
+            self._locked = bool(reply.arguments()[0])
+
+    def available(self) -> bool:
+        return self._iface is not None
+
+    @Slot(bool)
+    def _on_active_changed(self, active: bool):
+        self._locked = bool(active)
+        self.changed.emit()
+
+    def locked(self) -> bool:
+        return self._locked
+
+    def idle_ms(self) -> int:
+        if self._iface is None:
+            return 0
+        reply = self._iface.call("GetSessionIdleTime")
+        args = reply.arguments()
+        return int(args[0]) if args else 0
+
+
+def default_provider(parent=None) -> SessionProvider:
+    provider = DBusSessionProvider(parent)
+    if provider.available():
+        return provider
+    provider.deleteLater()
+    return SessionProvider(parent)
+
+
+class Lifecycle(QObject):
+    """
+    Suspends every registered buddy while the session is locked, the user
+    is idle or a fullscreen app is in front, and resumes them when that
+    ends. Idle is checked once, when it could next cross the threshold,
+    and then every IDLE_RETURN_CHECK_MS while suspended for it; lock
+    changes arrive as provider signals.
+    idle_after_ms <= 0 turns the idle check off.
+    """
+
+    suspended_changed = Signal(bool)
+
+    def __init__(self, provider: SessionProvider, idle_after_ms: int = IDLE_AFTER_MS, parent=None):
+        super().__init__(parent)
+        self.provider = provider
+        self.idle_after_ms = idle_after_ms
+        self.suspended = False
+        self._buddies: list = []
+
+        self._check = QTimer(self)
+        self._check.setSingleShot(True)
+        self._check.setTimerType(Qt.VeryCoarseTimer)
+        self._check.timeout.connect(self.update)
+        provider.changed.connect(self.update)
+        self.update()
+
+    def add(self, buddy):
+        self._buddies.append(buddy)
+        buddy.destroyed.connect(lambda: self._buddies.remove(buddy))
+        buddy.set_suspended(self.suspended)
+
+    def update(self):
+        locked = self.provider.locked()
+        fullscreen = self.provider.fullscreen()
+        idle = self.provider.idle_ms()
+        away = self.idle_after_ms > 0 and idle >= self.idle_after_ms
+        suspended = locked or fullscreen or away
+
+        if suspended != self.suspended:
+            self.suspended = suspended
+            for buddy in self._buddies:
+                buddy.set_suspended(suspended)
+            self.suspended_changed.emit(suspended)
+
+        if locked or fullscreen:
+            self._check.stop()  # the provider tells us when that ends
+        elif suspended:
+            self._check.start(IDLE_RETURN_CHECK_MS)
+        elif self.idle_after_ms > 0:
+            self._check.start(self.idle_after_ms - idle)
@@ -1,11 +1,42 @@
 import sys
+import time
+from collections import deque
+
+# Taken before the heavy imports so --profile-startup can time them
+IMPORT_START = time.perf_counter()
+
+import argparse
 import random
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt, QEvent, QPoint, QRect, QRectF, QTimer
+from PySide6.QtGui import QPainter, QPixmap, QRegion
 from PySide6.QtWidgets import QApplication, QWidget, QLabel, QSystemTrayIcon, QMenu, QStyle
 
+import startup_profile
+from animation import TIMER_SLACK_MS, FrameScheduler, Timeline, coalesce, now_ms, refresh_ms
+from bubble import BubbleLayout, BubbleRenderer
+from governor import Governor
+from lifecycle import IDLE_AFTER_MS, Lifecycle, default_provider
+from motion import MotionEngine
+from scaled import FILTERS, MAX_ZOOM, MIN_ZOOM, ScaledFrames, auto_zoom
+from speech import BACKENDS, Speaker, make_speaker
+from sprites import Frame, FrameStore, frame_from_pixmap
+
+# Decoded frames kept resident before idle-time animations get evicted
+FRAME_BUDGET_MB = 48
+
+# Typewriter speed for say(..., typewriter=True)
+TYPE_MS = 35
+
+# Window over which the effective frame rate is measured
+FPS_WINDOW_MS = 5000
+
+# Random actions that need the motion engine: a walk along the bottom of
+# the screen, and the exit/entrance pair played while leaving and returning
+WALK = "_walk"
+EXIT_ENTER = ("swing_out", "swing_in")
+
 
 def base_dir() -> Path:
     if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
@@ -17,90 +48,255 @@ BASE_DIR = base_dir()
 def resource_path(*parts: str) -> Path:
     return BASE_DIR.joinpath(*parts)
 
+def shared_frame_store(frame_budget_mb: int = FRAME_BUDGET_MB, scaled: ScaledFrames | None = None) -> FrameStore:
+    # One store for every buddy in the process, so each frame decodes once.
+    # Scaled frames take scale^2 the memory; the budget grows to match
+    budget = frame_budget_mb * 1024 * 1024 * (scaled.scale ** 2 if scaled is not None else 1)
+    return FrameStore(resource_path("assets"), int(budget), QApplication.instance(), scaled)
+
 class Buddy(QWidget):
-    def __init__(self):
+    def __init__(
+        self,
+        frame_budget_mb: int = FRAME_BUDGET_MB,
+        scheduler: FrameScheduler | None = None,
+        frames: FrameStore | None = None,
+        speaker: Speaker | None = None,
+        motion: MotionEngine | None = None,
+    ):
         super().__init__()
 
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.setStyleSheet("background: transparent;")
 
+        # Drags keep only the newest target and move the window at most once
+        # per display refresh; drag_latency holds input-to-move times (ms)
         self._drag_offset = None
-        self.TOP_PAD = 60
-
-        self.label = QLabel(self)
-
-        self.bubble = QLabel(self)
-        self.bubble.setWordWrap(True)
-        self.bubble.setStyleSheet("""
-            QLabel {
-                color: black;
-                background: rgba(255,255,255,235);
-                border-radius: 10px;
-                padding: 8px 10px;
-            }
-        """)
-        self.bubble.hide()
+        self._drag_target: QPoint | None = None
+        self._drag_since = 0.0
+        self._last_drag_move = 0.0
+        self.drag_moves = 0
+        self.drag_latency: deque[float] = deque(maxlen=512)
+
+        # Animation only runs while the window is shown and not fully covered
+        self.scheduler = scheduler or FrameScheduler.shared()
+        self.current_frames: list[Frame] = []
+        self._exposed = True
+
+        # Frames are composed into a widget-sized backbuffer (delta frames
+        # only patch it) and painted from there; frame_rect is the area
+        # that currently holds sprite pixels
+        self.frame: Frame | None = None
+        self.frame_rect = QRect()
+        self.frame_origin = QPoint()
+        self.backbuffer = QPixmap()
+
+        # Speech bubble, drawn over the backbuffer in paintEvent; while a
+        # typewriter reveal runs, bubble_pix is a private copy being filled in
+        self.bubbles = BubbleRenderer.shared()
+        self.speaker = speaker
+        # Walking, falling and entrances; None keeps the buddy where it is put
+        self.motion = motion
+        self.bubble: BubbleLayout | None = None
+        self.bubble_pix = QPixmap()
+        self.bubble_rect = QRect()
+        self.bubble_shown = 0
+        self.bubble_started = 0.0
+        self.bubble_ms = 0
 
         self.bubble_timer = QTimer(self)
         self.bubble_timer.setSingleShot(True)
-        self.bubble_timer.timeout.connect(self.bubble.hide)
+        self.bubble_timer.timeout.connect(self.hide_bubble)
 
-        self.anims: dict[str, list[QPixmap]] = {}
-        for name in self.list_anim_folders():
-            self.anims[name] = self.load_frames(name)
-
-        if not self.anims.get("idle"):
+        # Random actions; like the animation, the countdown is held while
+        # the buddy is hidden or suspended and picks up where it stopped
+        self.behavior_timer = QTimer(self)
+        self.behavior_timer.setSingleShot(True)
+        self.behavior_timer.timeout.connect(self.do_random_action)
+        self._behavior_left: int | None = None
+        # Set by Lifecycle while the screen is locked or the user is away
+        self.suspended = False
+        # Set by Governor on battery or under load: frames closer together
+        # than min_frame_ms are skipped, and actions come action_scale
+        # times less often
+        self.min_frame_ms = 0.0
+        self.action_scale = 1.0
+        self.frame_times: deque[float] = deque(maxlen=512)
+
+        self.frames = frames or FrameStore(resource_path("assets"), frame_budget_mb * 1024 * 1024, self)
+        self.frames.pin(self, {"idle"})
+        store = self.frames
+        # Room above the sprite for the speech bubble, zoomed with it
+        self.TOP_PAD = round(60 * self.frames.zoom)
+        self.destroyed.connect(lambda: store.unpin(self))
+        with startup_profile.phase("list animations"):
+            self.anim_names = self.frames.names()
+        self.next_action: str | None = None
+
+        if not self.frames.get("idle"):
             sprite_path = resource_path("assets", "sprites", "buddy.png")
             if not self.set_sprite(sprite_path):
-                self.label.setText("Missing: assets/sprites/buddy.png")
-                self.label.setStyleSheet("color: white; background: rgba(0,0,0,160); padding: 10px;")
-                self.label.adjustSize()
-                self.resize(self.label.size())
+                missing = QLabel("Missing: assets/sprites/buddy.png", self)
+                missing.setStyleSheet("color: white; background: rgba(0,0,0,160); padding: 10px;")
+                missing.adjustSize()
+                self.resize(missing.size())
             return
 
-        self.canvas_w, self.canvas_h = self.compute_canvas_size(self.anims)
+        with startup_profile.phase("canvas size"):
+            self.canvas_w, self.canvas_h = self.frames.canvas_size(self.anim_names)
         self.setFixedSize(self.canvas_w, self.canvas_h + self.TOP_PAD)
+        self.reset_backbuffer()
 
         self.anim_speeds = {
             "idle": 300,
             "_default": 100
         }
 
+        # Frames that were due but never shown because ticks came late
+        # (frames skipped on purpose under a frame rate cap do not count)
+        self.dropped_frames = 0
+        self.anim_dropped = 0
+
         self.current_anim = "idle"
-        self.current_frames = self.anims["idle"]
         self.current_loop = True
-        self.anim_i = 0
-
         self.frame_ms = self.anim_speeds["idle"]
-        self.set_pixmap(self.current_frames[0])
+        self.current_frames = coalesce(self.frames.get("idle"), self.frame_ms)
+        self.reset_timeline()
+        self.update_running()
+        self.schedule_next_action()
 
-        self.anim_timer = QTimer(self)
-        self.anim_timer.timeout.connect(self.tick_anim)
-        self.anim_timer.start(self.frame_ms)
+    def showEvent(self, event):
+        super().showEvent(event)
+        window = self.windowHandle()
+        if window is not None:
+            window.removeEventFilter(self)
+            window.installEventFilter(self)
+        self.update_running()
 
-        self.behavior_timer = QTimer(self)
-        self.behavior_timer.setSingleShot(True)
-        self.behavior_timer.timeout.connect(self.do_random_action)
-        self.schedule_next_action()
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_running()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Expose and obj is self.windowHandle():
+            self._exposed = obj.isExposed()
+            self.update_running()
+        return super().eventFilter(obj, event)
+
+    def is_running(self) -> bool:
+        return self.isVisible() and self._exposed and not self.suspended
+
+    def update_running(self):
+        if not self.current_frames:
+            return
+        now = now_ms()
+        if not self.is_running():
+            self.scheduler.cancel(self.tick_anim)
+            self.timeline.pause(now)
+            if self.behavior_timer.isActive():
+                self._behavior_left = self.behavior_timer.remainingTime()
+                self.behavior_timer.stop()
+            return
+
+        if self._behavior_left is not None:
+            self.behavior_timer.start(self._behavior_left)
+            self._behavior_left = None
+        if not self.scheduler.is_scheduled(self.tick_anim):
+            self.timeline.resume(now)
+            self.anim_planned = self.anim_pos + 1
+            self.scheduler.schedule(self.tick_anim, max(0.0, self.timeline.frame_end(self.anim_pos) - now))
+
+    def set_governed(self, min_frame_ms: float, action_scale: float):
+        """Frame rate cap (as the shortest time between frames, 0 for none) and action interval multiplier."""
+        self.min_frame_ms = min_frame_ms
+        self.action_scale = action_scale
+
+    def effective_fps(self) -> float:
+        """Frames actually put on screen per second, over the last FPS_WINDOW_MS."""
+        since = now_ms() - FPS_WINDOW_MS
+        return sum(1 for t in self.frame_times if t >= since) * 1000.0 / FPS_WINDOW_MS
+
+    def set_suspended(self, suspended: bool):
+        """
+        Suspend while nobody is looking: every timer stops, the buddy goes
+        back to idle on the floor and all other animations are released.
+        Resuming continues idle and the action countdown where they were.
+        """
+        if suspended == self.suspended:
+            return
+        self.suspended = suspended
+        if not self.current_frames:
+            return
+
+        if suspended:
+            if self.motion is not None and self.motion.is_moving(self):
+                self.motion.settle(self)
+            self.bubble_timer.stop()
+            self.hide_bubble()
+            if self.current_anim != "idle":
+                self.play("idle", loop=True)
+            self.frames.pin(self, {"idle"})
+            self.frames.release_unpinned()
+            self.update_running()
+            return
+
+        self.prefetch_next_action()
+        self.update_running()
+
+    def hit(self, pos: QPoint) -> bool:
+        # Transparent pixels click through to whatever is underneath
+        shape = self.mask()
+        return shape.isEmpty() or shape.contains(pos)
 
     def mousePressEvent(self, event):
+        if not self.hit(event.position().toPoint()):
+            event.ignore()
+            return
         if event.button() == Qt.LeftButton:
+            if self.motion is not None:
+                self.motion.stop(self)
             self._drag_offset = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
             event.accept()
 
     def mouseMoveEvent(self, event):
         if self._drag_offset is not None and event.buttons() & Qt.LeftButton:
-            self.move(event.globalPosition().toPoint() - self._drag_offset)
+            if self._drag_target is None:
+                self._drag_since = now_ms()
+                wait = self._last_drag_move + self.refresh_ms() - self._drag_since
+                self.scheduler.schedule(self.apply_drag, max(0.0, wait))
+            self._drag_target = event.globalPosition().toPoint() - self._drag_offset
             event.accept()
 
     def mouseReleaseEvent(self, event):
+        # Land exactly where the pointer let go
+        self.scheduler.cancel(self.apply_drag)
+        self.apply_drag()
+        if self._drag_offset is not None and self.motion is not None:
+            self.motion.fall(self)
         self._drag_offset = None
         event.accept()
 
+    def refresh_ms(self) -> float:
+        return refresh_ms(self.screen())
+
+    def apply_drag(self):
+        if self._drag_target is None:
+            return
+        self.move(self._drag_target)
+        self._drag_target = None
+        self._last_drag_move = now_ms()
+        self.drag_moves += 1
+        self.drag_latency.append(self._last_drag_move - self._drag_since)
+
     def contextMenuEvent(self, event):
+        if not self.hit(event.pos()):
+            event.ignore()
+            return
         menu = QMenu(self)
-        menu.addAction("Say hi", lambda: self.say("hi :)"))
+        cap = f", capped at {1000 / self.min_frame_ms:.0f}" if self.min_frame_ms else ""
+        menu.addAction(f"Animation: {self.effective_fps():.1f} fps{cap}").setEnabled(False)
+        menu.addSeparator()
+        menu.addAction("Say hi", lambda: self.say("hi :)", typewriter=True))
         menu.addAction("Do random action now", self.do_random_action)
         menu.addAction("Return to idle", lambda: self.play("idle", loop=True))
         quit_action = menu.addAction("Quit")
@@ -113,133 +309,395 @@ class Buddy(QWidget):
         pix = QPixmap(str(path))
         if pix.isNull():
             return False
-        self.set_pixmap(pix)
+        self.canvas_w, self.canvas_h = pix.width(), pix.height()
+        self.resize(self.canvas_w, self.canvas_h + self.TOP_PAD)
+        self.reset_backbuffer()
+        self.set_frame(frame_from_pixmap(pix))
         return True
 
-    def set_pixmap(self, pix: QPixmap):
-        self.label.setPixmap(pix)
-        self.label.resize(pix.size())
+    def reset_backbuffer(self):
+        # At the frames' device pixel ratio, so sprites are copied 1:1
+        dpr = self.frames.dpr
+        self.backbuffer = QPixmap(round(self.canvas_w * dpr), round((self.canvas_h + self.TOP_PAD) * dpr))
+        self.backbuffer.setDevicePixelRatio(dpr)
+        self.backbuffer.fill(Qt.transparent)
+        self.frame = None
+        self.frame_rect = QRect()
+
+    def update_mask(self):
+        """
+        Shape the window to the current frame plus the speech bubble. Input
+        outside the shape passes through, and without a compositor only the
+        shape is drawn at all, so the translucent background never shows
+        up as a black box.
+        """
+        if self.frame is None:
+            return
+        shape = self.frame.mask.translated(self.frame_origin)
+        if not self.bubble_rect.isEmpty():
+            shape += self.bubble_rect
+        # An empty region would clear the mask and make the whole window solid
+        if shape.isEmpty() or shape == self.mask():
+            return
+        self.setMask(shape)
+
+    def set_frame(self, frame: Frame):
+        if frame is self.frame:
+            return
 
-        x = (self.canvas_w - pix.width()) // 2
+        x = (self.canvas_w - frame.canvas.width()) // 2
         if x < 0:
             x = 0
 
-        y = self.TOP_PAD + (self.canvas_h - pix.height())
+        y = self.TOP_PAD + (self.canvas_h - frame.canvas.height())
         if y < self.TOP_PAD:
             y = self.TOP_PAD
 
-        self.label.move(x, y)
-
-    def say(self, text: str, ms: int = 2500):
-        self.bubble.setText(text)
-        self.bubble.adjustSize()
+        origin = QPoint(x, y)
+        painter = QPainter(self.backbuffer)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+
+        if frame.patches:
+            # Delta frame: overwrite only the rectangles that changed
+            dirty = QRegion()
+            for patch in frame.patches:
+                target = QRect(origin + patch.pos, patch.rect.size())
+                painter.drawPixmap(target.topLeft(), patch.pixmap, patch.rect)
+                dirty += target
+            self.frame_rect = self.frame_rect.united(dirty.boundingRect())
+        else:
+            # Trimmed frames only cover their own bounding box on the canvas;
+            # repaint just the area the old and new frames occupy
+            rect = QRect(origin + frame.offset, frame.size)
+            painter.fillRect(self.frame_rect, Qt.transparent)
+            painter.drawPixmap(rect.topLeft(), frame.pixmap, frame.rect)
+            dirty = QRegion(self.frame_rect.united(rect))
+            self.frame_rect = rect
+
+        painter.end()
+        self.frame = frame
+        self.frame_origin = origin
+        self.update_mask()
+        self.update(dirty)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.frame is not None:
+            dpr = self.backbuffer.devicePixelRatio()
+            for rect in event.region():
+                source = QRectF(rect.x() * dpr, rect.y() * dpr, rect.width() * dpr, rect.height() * dpr)
+                painter.drawPixmap(QRectF(rect), self.backbuffer, source)
+        if not self.bubble_rect.isEmpty() and event.region().intersects(self.bubble_rect):
+            painter.setClipRegion(event.region())
+            painter.drawPixmap(self.bubble_rect.topLeft(), self.bubble_pix)
+        painter.end()
+        startup_profile.finish()
+
+    def say(self, text: str, ms: int = 2500, typewriter: bool = False):
+        """Show text in a bubble for ms, spoken aloud if there is a speaker."""
+        if self.speaker is None:
+            self.show_bubble(text, ms, typewriter)
+        else:
+            # The bubble appears when the audio starts
+            self.speaker.speak(text, lambda _audio: self.show_bubble(text, ms, typewriter))
+
+    def show_bubble(self, text: str, ms: int, typewriter: bool):
+        """typewriter types the text out before the ms countdown starts."""
+        self.scheduler.cancel(self.tick_bubble)
+        old = QRect(self.bubble_rect)
+
+        self.bubble = self.bubbles.layout(text, self.font(), self.width())
+        dpr = self.devicePixelRatioF()
+        if typewriter and text:
+            self.bubble_pix = self.bubbles.blank(self.bubble, dpr).copy()
+            self.bubble_shown = 0
+        else:
+            self.bubble_pix = self.bubbles.pixmap(self.bubble, dpr)
+            self.bubble_shown = len(text)
 
-        x = (self.width() - self.bubble.width()) // 2
-        y = self.TOP_PAD - self.bubble.height() - 8
+        size = self.bubble.size
+        x = (self.width() - size.width()) // 2
+        y = self.TOP_PAD - size.height() - 8
         if y < 0:
             y = 0
-        self.bubble.move(x, y)
-
-        self.bubble.show()
-        self.bubble.raise_()
-        self.bubble_timer.start(ms)
-
-    def list_anim_folders(self) -> list[str]:
-        sprites_dir = resource_path("assets", "sprites")
-        if not sprites_dir.exists():
-            return []
-        return sorted([p.name for p in sprites_dir.iterdir() if p.is_dir()])
-
-    def load_frames(self, anim_name: str) -> list[QPixmap]:
-        folder = resource_path("assets", "sprites", anim_name)
-        order_file = folder / "order.txt"
-
-        paths: list[Path] = []
-        if order_file.exists():
-            for line in order_file.read_text(encoding="utf-8").splitlines():
-                name = line.strip()
-                if not name or name.startswith("#"):
-                    continue
-                paths.append(folder / name)
+        self.bubble_rect = QRect(QPoint(x, y), size)
+
+        self.update(QRegion(old) + self.bubble_rect)
+        self.update_mask()
+
+        self.bubble_ms = ms
+        self.bubble_timer.stop()
+        if self.bubble_shown < len(text):
+            self.bubble_started = now_ms()
+            self.scheduler.schedule(self.tick_bubble, TYPE_MS)
         else:
-            paths = sorted(folder.glob("*.png"))
-
-        frames: list[QPixmap] = []
-        for p in paths:
-            if not p.exists():
-                continue
-            pix = QPixmap(str(p))
-            if not pix.isNull():
-                frames.append(pix)
-
-        return frames
-
-    def compute_canvas_size(self, anims: dict[str, list[QPixmap]]) -> tuple[int, int]:
-        max_w = 1
-        max_h = 1
-        for frames in anims.values():
-            for pix in frames:
-                if pix.width() > max_w:
-                    max_w = pix.width()
-                if pix.height() > max_h:
-                    max_h = pix.height()
-        return max_w, max_h
-
-    def play(self, anim_name: str, loop: bool):
-        frames = self.anims.get(anim_name, [])
+            self.bubble_timer.start(ms)
+
+    def tick_bubble(self) -> float | None:
+        """Reveal the characters due by now; returns ms until the next one."""
+        if self.bubble is None:
+            return None
+        text = self.bubble.text
+        elapsed = now_ms() - self.bubble_started + TIMER_SLACK_MS
+        due = min(len(text), int(elapsed // TYPE_MS))
+        if due > self.bubble_shown:
+            changed = self.bubbles.reveal(self.bubble_pix, self.bubble, self.bubble_shown, due)
+            self.bubble_shown = due
+            self.update(changed.translated(self.bubble_rect.topLeft()))
+
+        if self.bubble_shown >= len(text):
+            self.bubble_timer.start(self.bubble_ms)
+            return None
+        return TYPE_MS - elapsed % TYPE_MS
+
+    def hide_bubble(self):
+        self.scheduler.cancel(self.tick_bubble)
+        self.update(self.bubble_rect)
+        self.bubble = None
+        self.bubble_pix = QPixmap()
+        self.bubble_rect = QRect()
+        self.update_mask()
+
+    def play(self, anim_name: str, loop: bool) -> bool:
+        frames = self.frames.get(anim_name) if anim_name in self.anim_names else []
         if not frames:
-            return
-
-        self.current_anim = anim_name
-        self.current_frames = frames
-        self.current_loop = loop
-        self.anim_i = 0
+            return False
 
-        self.set_pixmap(self.current_frames[0])
+        # Keep the running animation resident alongside idle
+        self.frames.pin(self, {"idle", anim_name})
 
         ms = self.anim_speeds.get(anim_name, self.anim_speeds["_default"])
         self.frame_ms = ms
-        print("PLAY", anim_name, "ms =", ms)
-        self.anim_timer.start(ms)
 
-    def tick_anim(self):
-        if not self.current_frames:
-            return
+        self.current_anim = anim_name
+        self.current_frames = coalesce(frames, ms)
+        self.current_loop = loop
+        self.reset_timeline()
 
-        self.anim_i += 1
+        print("PLAY", anim_name, "ms =", ms)
+        self.scheduler.cancel(self.tick_anim)
+        self.update_running()
+        return True
 
-        if self.anim_i >= len(self.current_frames):
-            if self.current_loop:
-                self.anim_i = 0
-            else:
-                self.play("idle", loop=True)
-                self.schedule_next_action()
-                return
+    def reset_timeline(self):
+        # Playback follows the clock from now: anim_pos counts frames since
+        # the start (across loops), anim_i is the entry on screen
+        self.timeline = Timeline([frame.duration for frame in self.current_frames], self.current_loop)
+        self.anim_pos = 0
+        self.anim_planned = 1
+        self.anim_i = 0
+        self.anim_dropped = 0
+        self.set_frame(self.current_frames[0])
 
-        self.set_pixmap(self.current_frames[self.anim_i])
+    def tick_anim(self) -> float | None:
+        """Show the frame that is due now; returns ms until the next change, or None."""
+        if not self.current_frames:
+            return None
+
+        now = now_ms()
+        pos = self.timeline.position(now + TIMER_SLACK_MS)
+        if pos is None:
+            self.play("idle", loop=True)
+            self.schedule_next_action()
+            return None
+
+        if pos > self.anim_pos:
+            self.advance_to(pos, self.anim_planned)
+
+        if self.current_loop and len(self.current_frames) == 1:
+            return None  # a looping still image never changes
+
+        # Under a frame rate cap, sleep through the frames that would come
+        # sooner than min_frame_ms and wake at the start of the next one
+        ahead = self.timeline.position(now + self.min_frame_ms) if self.min_frame_ms else None
+        if ahead is not None and ahead > pos + 1:
+            self.anim_planned = ahead
+            return max(0.0, self.timeline.frame_end(ahead - 1) - now)
+        self.anim_planned = pos + 1
+        return max(0.0, self.timeline.frame_end(pos) - now)
+
+    def advance_to(self, pos: int, planned: int | None = None):
+        """
+        Jump to frame number pos, skipping any frames we are too late for.
+        planned is the frame the tick was meant for; frames before it were
+        skipped on purpose and are not counted as dropped.
+        """
+        n = len(self.current_frames)
+        first = self.anim_pos + 1
+
+        # Delta frames patch their predecessor, so catching up has to
+        # compose from the newest keyframe at or before pos
+        start = first
+        for k in range(pos, max(first, pos - n + 1) - 1, -1):
+            if not self.current_frames[k % n].patches:
+                start = k
+                break
+        for k in range(start, pos + 1):
+            self.set_frame(self.current_frames[k % n])
+
+        dropped = max(0, pos - max(first, planned or first))
+        self.anim_dropped += dropped
+        self.dropped_frames += dropped
+        self.anim_pos = pos
+        self.anim_i = pos % n
+        self.frame_times.append(now_ms())
 
     def schedule_next_action(self):
-        delay_ms = random.randint(8000, 25000)
-        self.behavior_timer.start(delay_ms)
+        # Pick the next action now so it can decode in the background
+        choices = [name for name in self.anim_names if name != "idle"]
+        if self.motion is not None:
+            choices.append(WALK)
+        self.next_action = random.choice(choices) if choices else None
+        self.prefetch_next_action()
+
+        delay_ms = int(random.randint(8000, 25000) * self.action_scale)
+        if self.is_running():
+            self.behavior_timer.start(delay_ms)
+        else:
+            self._behavior_left = delay_ms
+
+    def prefetch_next_action(self):
+        if self.next_action in EXIT_ENTER:
+            for name in EXIT_ENTER:
+                if name in self.anim_names:
+                    self.frames.prefetch(name)
+        elif self.next_action in self.anim_names:
+            self.frames.prefetch(self.next_action)
 
     def do_random_action(self):
-        choices = [name for name, frames in self.anims.items() if name != "idle" and frames]
-        if not choices:
+        if self.motion is not None and self.next_action == WALK:
+            self.walk_somewhere()
+        elif self.motion is not None and self.next_action in EXIT_ENTER:
+            self.exit_and_return()
+        elif self.next_action is None or not self.play(self.next_action, loop=False):
             self.schedule_next_action()
-            return
-        self.play(random.choice(choices), loop=False)
 
-app = QApplication(sys.argv)
-
-buddy = Buddy()
-buddy.show()
+    def walk_somewhere(self):
+        area = self.motion.work_area(self)
+        x = random.randint(area.left(), max(area.left(), area.right() - self.width()))
+        self.motion.walk_to(self, x)
+        self.schedule_next_action()
 
-tray = QSystemTrayIcon(app)
-tray.setIcon(app.style().standardIcon(QStyle.SP_MessageBoxInformation))
-menu = QMenu()
-menu.addAction("Show", lambda: (buddy.show(), buddy.raise_(), buddy.activateWindow()))
-menu.addAction("Quit", app.quit)
-tray.setContextMenu(menu)
-tray.show()
+    def exit_and_return(self):
+        """Swing off the nearer side of the screen, then swing back in from the other."""
+        area = self.motion.work_area(self)
+        leave_left = self.geometry().center().x() < area.center().x()
+        off_x = area.left() - self.width() if leave_left else area.right() + 1
+        back_x = area.right() + 1 if leave_left else area.left() - self.width()
+
+        def enter():
+            land = QPoint(random.randint(area.left(), max(area.left(), area.right() - self.width())),
+                          area.bottom() + 1 - self.height())
+            if not self.play(EXIT_ENTER[1], loop=False):
+                self.play("idle", loop=True)
+                self.schedule_next_action()
+            self.motion.tween(self, land, self.timeline.total, start=QPoint(back_x, land.y()))
 
-sys.exit(app.exec())
+        if not self.play(EXIT_ENTER[0], loop=False):
+            self.schedule_next_action()
+            return
+        # Moves span exactly as long as the animations they go with
+        self.motion.tween(self, QPoint(off_x, self.y()), self.timeline.total, on_done=enter)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Desktop buddy.")
+    parser.add_argument("-n", "--buddies", type=int, default=1,
+                        help="number of buddies to run in this process")
+    parser.add_argument("--no-physics", action="store_true",
+                        help="stay where dropped instead of falling, walking and swinging around")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase took, up to the first paint")
+    parser.add_argument("--speech", choices=["auto", "off", *BACKENDS], default="auto",
+                        help="text-to-speech backend for speech bubbles")
+    parser.add_argument("--voice", default="en")
+    parser.add_argument("--zoom", default="1", metavar="FACTOR",
+                        help=f"size of the buddy, {MIN_ZOOM:g} to {MAX_ZOOM:g}, or 'auto' to suit the screen's pixel density")
+    parser.add_argument("--scale-filter", choices=FILTERS, default="nearest",
+                        help="how frames are resized when zoomed or on a high-DPI screen")
+    parser.add_argument("--full-fps", action="store_true",
+                        help="keep full frame rate on battery and under load")
+    parser.add_argument("--suspend-after", type=float, metavar="MINUTES", default=IDLE_AFTER_MS / 60000,
+                        help="suspend after this long without keyboard or mouse input (0: never)")
+    args, qt_args = parser.parse_known_args(argv)
+    if args.zoom != "auto":
+        try:
+            zoom = float(args.zoom)
+        except ValueError:
+            zoom = 0.0
+        if not MIN_ZOOM <= zoom <= MAX_ZOOM:
+            parser.error(f"--zoom: expected 'auto' or a number from {MIN_ZOOM:g} to {MAX_ZOOM:g}")
+
+    if args.profile_startup:
+        startup_profile.start(IMPORT_START)
+
+    with startup_profile.phase("QApplication"):
+        app = QApplication(sys.argv[:1] + qt_args)
+
+    with startup_profile.phase("frame store"):
+        screen = app.primaryScreen()
+        if args.zoom == "auto":
+            zoom = auto_zoom(screen)
+        dpr = screen.devicePixelRatio()
+        scaled = None
+        if zoom != 1 or dpr != 1:
+            scaled = ScaledFrames(zoom, dpr, smooth=args.scale_filter == "smooth")
+        frames = shared_frame_store(scaled=scaled)
+        if scaled is not None:
+            # Fill the on-disk cache for later runs (and later actions)
+            scaled.warm(frames.assets_dir, frames.names(), frames.pack)
+    with startup_profile.phase("speech"):
+        speaker = make_speaker(args.speech, args.voice, app)
+        if speaker is not None:
+            app.aboutToQuit.connect(speaker.stop)
+    motion = None if args.no_physics else MotionEngine.shared()
+    buddies = []
+    for _ in range(max(1, args.buddies)):
+        with startup_profile.phase("Buddy"):
+            buddies.append(Buddy(frames=frames, speaker=speaker, motion=motion))
+    if len(buddies) > 1:
+        # Line them up along the bottom of the screen
+        area = app.primaryScreen().availableGeometry()
+        x = area.right()
+        for buddy in buddies:
+            x -= buddy.width()
+            buddy.move(max(area.left(), x), area.bottom() - buddy.height())
+    with startup_profile.phase("show"):
+        for buddy in buddies:
+            buddy.show()
+            if motion is not None:
+                motion.fall(buddy)
+
+    # Everything stops while the screen is locked or the user is away
+    lifecycle = Lifecycle(default_provider(app), int(args.suspend_after * 60000), app)
+    for buddy in buddies:
+        lifecycle.add(buddy)
+    # Fewer frames and actions on battery or when the machine is busy
+    governor = None if args.full_fps else Governor(parent=app)
+    if governor is not None:
+        for buddy in buddies:
+            governor.add(buddy)
+        governor.set_suspended(lifecycle.suspended)
+        lifecycle.suspended_changed.connect(governor.set_suspended)
+
+    def show_all():
+        for buddy in buddies:
+            buddy.show()
+            buddy.raise_()
+        buddies[0].activateWindow()
+
+    with startup_profile.phase("tray"):
+        tray = QSystemTrayIcon(app)
+        tray.setIcon(app.style().standardIcon(QStyle.SP_MessageBoxInformation))
+        menu = QMenu()
+        menu.addAction("Show", show_all)
+        menu.addAction("Quit", app.quit)
+        tray.setContextMenu(menu)
+        if governor is not None:
+            tray.setToolTip(f"Buddy: {governor.level} frame rate")
+            governor.changed.connect(lambda level: tray.setToolTip(f"Buddy: {level} frame rate"))
+        tray.show()
+
+    return app.exec()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import math
+from dataclasses import dataclass, field
+from typing import Callable
+
+from PySide6.QtCore import QCoreApplication, QObject, QPoint, QPointF, QRect
+from PySide6.QtGui import QGuiApplication
+from PySide6.QtWidgets import QWidget
+
+from animation import FrameScheduler, now_ms, refresh_ms
+
+STEP_MS = 1000 / 120      # fixed physics timestep
+MAX_FRAME_MS = 250        # longest stall that is simulated rather than skipped
+GRAVITY = 2600.0          # px/s^2
+MAX_FALL_SPEED = 2200.0   # px/s
+WALK_SPEED = 90.0         # px/s
+
+
+def ease_in_out(t: float) -> float:
+    return 0.5 - 0.5 * math.cos(math.pi * min(1.0, max(0.0, t)))
+
+
+def floor_y(widget: QWidget, area: QRect) -> float:
+    """Window y at which the widget stands on the bottom of area."""
+    return float(area.bottom() + 1 - widget.height())
+
+
+@dataclass(eq=False)
+class Body:
+    """Motion state of one window, in window top-left coordinates."""
+    widget: QWidget
+    mode: str                       # "fall", "walk" or "tween"
+    pos: QPointF
+    prev: QPointF
+    vy: float = 0.0
+    target: QPointF = field(default_factory=QPointF)
+    start: QPointF = field(default_factory=QPointF)
+    floor: float = 0.0
+    elapsed: float = 0.0            # ms, tweens only
+    duration: float = 0.0
+    on_done: Callable[[], None] | None = None
+    shown: QPoint | None = None     # last position handed to move()
+
+    def step(self, dt: float) -> bool:
+        """Advance by dt ms; returns True once the motion is finished."""
+        self.prev = QPointF(self.pos)
+        s = dt / 1000.0
+
+        if self.mode == "fall":
+            self.vy = min(MAX_FALL_SPEED, self.vy + GRAVITY * s)
+            y = self.pos.y() + self.vy * s
+            if y >= self.floor:
+                self.pos.setY(self.floor)
+                return True
+            self.pos.setY(y)
+            return False
+
+        if self.mode == "walk":
+            dx = self.target.x() - self.pos.x()
+            travel = WALK_SPEED * s
+            if abs(dx) <= travel:
+                self.pos = QPointF(self.target)
+                return True
+            self.pos.setX(self.pos.x() + math.copysign(travel, dx))
+            return False
+
+        self.elapsed += dt
+        f = ease_in_out(self.elapsed / self.duration) if self.duration > 0 else 1.0
+        self.pos = self.start + (self.target - self.start) * f
+        return self.elapsed >= self.duration
+
+
+class MotionEngine(QObject):
+    """
+    Moves windows around the desktop: falling onto the bottom of the work
+    area, walking along it and eased tweens for entrances and exits.
+
+    Physics advances in fixed STEP_MS steps however irregular the wakeups
+    are. Windows are moved once per display refresh, all in one pass, to a
+    position interpolated between the last two steps. With nothing moving
+    it is not scheduled at all.
+    """
+
+    _shared: "MotionEngine | None" = None
+
+    def __init__(self, scheduler: FrameScheduler | None = None, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler or FrameScheduler.shared()
+        self._bodies: dict[QWidget, Body] = {}
+        self._running = False
+        self._last = 0.0
+        self._acc = 0.0
+        self.steps = 0
+        self.moves = 0
+
+    @classmethod
+    def shared(cls) -> "MotionEngine":
+        if cls._shared is None:
+            cls._shared = cls(parent=QCoreApplication.instance())
+        return cls._shared
+
+    @staticmethod
+    def work_area(widget: QWidget) -> QRect:
+        screen = widget.screen() or QGuiApplication.primaryScreen()
+        return screen.availableGeometry()
+
+    def fall(self, widget: QWidget, on_done: Callable[[], None] | None = None):
+        """Drop widget onto the bottom of its screen's work area."""
+        area = self.work_area(widget)
+        body = self._start(widget, "fall", on_done)
+        body.floor = floor_y(widget, area)
+        if body.pos.y() >= body.floor:
+            body.pos.setY(body.floor)
+
+    def walk_to(self, widget: QWidget, x: float, on_done: Callable[[], None] | None = None):
+        """Walk along the bottom of the work area to window x."""
+        area = self.work_area(widget)
+        x = min(max(x, area.left()), area.right() + 1 - widget.width())
+        body = self._start(widget, "walk", on_done)
+        body.pos.setY(floor_y(widget, area))
+        body.target = QPointF(x, body.pos.y())
+
+    def tween(
+        self,
+        widget: QWidget,
+        to: QPoint,
+        ms: float,
+        start: QPoint | None = None,
+        on_done: Callable[[], None] | None = None,
+    ):
+        """Glide from start (default: where it is) to `to` over ms, eased."""
+        body = self._start(widget, "tween", on_done)
+        if start is not None:
+            body.pos = body.prev = QPointF(start)
+        body.start = QPointF(body.pos)
+        body.target = QPointF(to)
+        body.duration = ms
+
+    def stop(self, widget: QWidget):
+        """Stop moving widget where it is, without calling on_done."""
+        self._bodies.pop(widget, None)
+        if not self._bodies and self._running:
+            self._running = False
+            self.scheduler.cancel(self._tick)
+
+    def settle(self, widget: QWidget):
+        """Stop widget and put it straight down on the floor of its work area."""
+        self.stop(widget)
+        area = self.work_area(widget)
+        x = min(max(widget.x(), area.left()), area.right() + 1 - widget.width())
+        widget.move(x, int(floor_y(widget, area)))
+
+    def is_moving(self, widget: QWidget) -> bool:
+        return widget in self._bodies
+
+    def _start(self, widget: QWidget, mode: str, on_done) -> Body:
+        old = self._bodies.get(widget)
+        pos = QPointF(old.pos) if old is not None else QPointF(widget.pos())
+        body = Body(widget, mode, pos, QPointF(pos), on_done=on_done, shown=widget.pos())
+        self._bodies[widget] = body
+        if not self._running:
+            self._running = True
+            self._last = now_ms()
+            self._acc = 0.0
+            self.scheduler.schedule(self._tick, 0)
+        return body
+
+    def _tick(self) -> float | None:
+        now = now_ms()
+        self._acc += min(now - self._last, MAX_FRAME_MS)
+        self._last = now
+
+        done: list[Body] = []
+        while self._acc >= STEP_MS:
+            self._acc -= STEP_MS
+            self.steps += 1
+            for body in self._bodies.values():
+                if body not in done and body.step(STEP_MS):
+                    done.append(body)
+        alpha = self._acc / STEP_MS
+
+        # One batch of moves per refresh, at the interpolated positions
+        for body in list(self._bodies.values()):
+            pos = body.pos if body in done else body.prev + (body.pos - body.prev) * alpha
+            target = pos.toPoint()
+            if target != body.shown:
+                body.widget.move(target)
+                body.shown = target
+                self.moves += 1
+
+        for body in done:
+            if self._bodies.get(body.widget) is body:
+                del self._bodies[body.widget]
+        # Callbacks may start new motions (an exit followed by an entrance)
+        for body in done:
+            if body.on_done is not None:
+                body.on_done()
+
+        if not self._bodies:
+            self._running = False
+            return None
+        return refresh_ms(QGuiApplication.primaryScreen())
@@ -0,0 +1,248 @@
+"""
+Pre-scaled frames for zoomed and high-DPI buddies.
+
+Frames are scaled once per zoom, device pixel ratio and filter and kept in
+an on-disk cache, so later runs only decode the result and nothing is ever
+rescaled while animating. Scaled pixmaps carry the screen's device pixel
+ratio: their pixels map one to one onto the screen and Qt has nothing left
+to interpolate.
+
+Geometry is rounded on the logical (zoomed) grid and then multiplied by the
+device pixel ratio, so at integer ratios every frame lands on whole
+logical and device pixels.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from PySide6.QtCore import QPoint, QRect, QRunnable, QSize, QStandardPaths, QThreadPool, Qt
+from PySide6.QtGui import QImage, QPainter, QRegion, QScreen
+
+import startup_profile
+from sprites import Decoded, FrameSpec, PackFile, alpha_bands, decode_animation, parse_mask, pixmap_format, read_image
+
+SCALED_VERSION = 2
+FILTERS = ("nearest", "smooth")
+MIN_ZOOM = 0.5
+MAX_ZOOM = 4.0
+
+# Pixel density the sprites were drawn for
+REFERENCE_DPI = 110
+
+
+def default_cache_dir() -> Path:
+    return Path(QStandardPaths.writableLocation(QStandardPaths.CacheLocation)) / "frames"
+
+
+def auto_zoom(screen: QScreen) -> float:
+    """
+    Zoom that gives the buddy about its intended physical size on screen,
+    in half steps. Screens Qt already scales up come out at or near 1.
+    """
+    dpi = screen.physicalDotsPerInch() / screen.devicePixelRatio()
+    return min(MAX_ZOOM, max(1.0, round(2 * dpi / REFERENCE_DPI) / 2))
+
+
+def region_bands(region: QRegion) -> str:
+    """region in the band format parse_mask reads, one band per rectangle."""
+    return ";".join(f"{r.top()},{r.bottom() + 1},{r.left()},{r.right() + 1}" for r in region)
+
+
+def _tmp_path(path: Path) -> Path:
+    # A prefetch and a warm-up task may write the same file at once
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def source_stamp(assets_dir: Path, name: str) -> str:
+    """Changes whenever any file an animation can be decoded from changes."""
+    paths = [assets_dir / "sprites.pack", assets_dir / "atlas" / f"{name}.json"]
+    folder = assets_dir / "sprites" / name
+    if folder.is_dir():
+        paths.extend(sorted(folder.iterdir()))
+    parts = []
+    for p in paths:
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        parts.append(f"{p}:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class ScaledFrames:
+    """
+    Scales animations for a FrameStore and persists the results under
+    cache_dir, one folder per zoom, device pixel ratio and filter. Images
+    are stored by content, so poses shared between animations are stored
+    and loaded once.
+
+    Delta frames are composed into standalone frames first: patches scaled
+    one by one would show seams along their edges.
+    """
+
+    def __init__(self, zoom: float, dpr: float, smooth: bool = False, cache_dir: Path | None = None):
+        self.zoom = zoom
+        self.dpr = dpr
+        self.smooth = smooth
+        root = cache_dir or default_cache_dir()
+        self.dir = root / f"{zoom:g}x{dpr:g}-{FILTERS[smooth]}"
+        self.images_dir = self.dir / "images"
+
+    @property
+    def scale(self) -> float:
+        """Image pixels per source pixel."""
+        return self.zoom * self.dpr
+
+    def logical(self, v: int) -> int:
+        return round(v * self.zoom)
+
+    def canvas(self, size: QSize) -> QSize:
+        return QSize(max(1, self.logical(size.width())), max(1, self.logical(size.height())))
+
+    def decode(self, assets_dir: Path, name: str, pack: PackFile | None = None) -> Decoded:
+        """An animation at this scale, from the cache or scaled now and cached."""
+        stamp = source_stamp(assets_dir, name)
+        decoded = self.load(name, stamp)
+        if decoded is None:
+            decoded = self.scale_decoded(decode_animation(assets_dir, name, pack=pack))
+            if decoded.frames:
+                self.save(name, stamp, decoded)
+        return decoded
+
+    def warm(self, assets_dir: Path, names: list[str], pack: PackFile | None = None):
+        """Scale every animation missing from the cache, in the background."""
+        for name in names:
+            if self.load_table(name, source_stamp(assets_dir, name)) is None:
+                QThreadPool.globalInstance().start(_WarmTask(self, assets_dir, name, pack))
+
+    def table_path(self, name: str) -> Path:
+        return self.dir / f"{name}.json"
+
+    def load_table(self, name: str, stamp: str) -> dict | None:
+        try:
+            table = json.loads(self.table_path(name).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if table.get("version") != SCALED_VERSION or table.get("source") != stamp:
+            return None
+        return table
+
+    def load(self, name: str, stamp: str) -> Decoded | None:
+        table = self.load_table(name, stamp)
+        if table is None:
+            return None
+
+        canvas = QSize(*table["canvas"])
+        images: dict[str, QImage] = {}
+        frames = []
+        for f in table["frames"]:
+            key = str(self.images_dir / f["image"])
+            img = images.get(key)
+            if img is None:
+                with startup_profile.decoding(key):
+                    img = images[key] = read_image(Path(key))
+                if img.isNull():
+                    return None
+            offset = QPoint(*f["offset"])
+            frames.append(FrameSpec(key, img.rect(), offset, canvas, f["duration"], mask=parse_mask(f["mask"], offset), ticks=f["ticks"]))
+        return Decoded(images, frames)
+
+    def save(self, name: str, stamp: str, decoded: Decoded):
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        frames = []
+        for spec in decoded.frames:
+            path = Path(spec.key)
+            if not path.exists():
+                tmp = _tmp_path(path)
+                decoded.images[spec.key].save(str(tmp), "PNG")
+                tmp.replace(path)
+            mask = spec.mask.translated(-spec.offset)
+            frames.append({
+                "image": path.name,
+                "offset": [spec.offset.x(), spec.offset.y()],
+                "duration": spec.duration,
+                "ticks": spec.ticks,
+                "mask": region_bands(mask),
+            })
+
+        canvas = decoded.frames[0].canvas
+        table = {"version": SCALED_VERSION, "source": stamp, "canvas": [canvas.width(), canvas.height()], "frames": frames}
+        path = self.table_path(name)
+        tmp = _tmp_path(path)
+        tmp.write_text(json.dumps(table), encoding="utf-8")
+        tmp.replace(path)
+
+    def scale_decoded(self, decoded: Decoded) -> Decoded:
+        """Scale a source animation into standalone frames keyed by content."""
+        mode = Qt.SmoothTransformation if self.smooth else Qt.FastTransformation
+        images: dict[str, QImage] = {}
+        frames = []
+        # Animations with delta frames are played through on a full canvas
+        composed: QImage | None = None
+        has_deltas = any(spec.patches for spec in decoded.frames)
+
+        for spec in decoded.frames:
+            if has_deltas:
+                composed = self._compose(composed, decoded, spec)
+            if spec.patches:
+                area = spec.mask.boundingRect() if spec.mask is not None else QRect(QPoint(0, 0), spec.canvas)
+                if area.isEmpty():
+                    area = QRect(0, 0, 1, 1)
+                src, offset = composed.copy(area), area.topLeft()
+            else:
+                src, offset = decoded.images[spec.key].copy(spec.rect), spec.offset
+            source_mask = spec.mask if spec.mask is not None else parse_mask(alpha_bands(src), offset)
+
+            # Round the frame's edges on the logical grid, then go to device pixels
+            left, top = self.logical(offset.x()), self.logical(offset.y())
+            right = max(left + 1, self.logical(offset.x() + src.width()))
+            bottom = max(top + 1, self.logical(offset.y() + src.height()))
+            size = QSize(round((right - left) * self.dpr), round((bottom - top) * self.dpr))
+            img = src.scaled(size, Qt.IgnoreAspectRatio, mode).convertToFormat(pixmap_format())
+
+            key = str(self.images_dir / f"{hashlib.sha1(img.constBits()).hexdigest()}.png")
+            images.setdefault(key, img)
+            frames.append(FrameSpec(
+                key, img.rect(), QPoint(left, top), self.canvas(spec.canvas), spec.duration,
+                mask=self._scale_mask(source_mask), ticks=spec.ticks,
+            ))
+
+        return Decoded(images, frames)
+
+    def _compose(self, composed: QImage | None, decoded: Decoded, spec: FrameSpec) -> QImage:
+        if composed is None:
+            composed = QImage(spec.canvas, pixmap_format())
+            composed.fill(Qt.transparent)
+        painter = QPainter(composed)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        if spec.patches:
+            for key, rect, pos in spec.patches:
+                painter.drawImage(pos, decoded.images[key], rect)
+        else:
+            painter.fillRect(composed.rect(), Qt.transparent)
+            painter.drawImage(spec.offset, decoded.images[spec.key], spec.rect)
+        painter.end()
+        return composed
+
+    def _scale_mask(self, mask: QRegion) -> QRegion:
+        scaled = QRegion()
+        for r in mask:
+            left, top = self.logical(r.left()), self.logical(r.top())
+            right, bottom = self.logical(r.right() + 1), self.logical(r.bottom() + 1)
+            if right > left and bottom > top:
+                scaled += QRect(left, top, right - left, bottom - top)
+        return scaled
+
+
+class _WarmTask(QRunnable):
+    def __init__(self, scaled: ScaledFrames, assets_dir: Path, name: str, pack: PackFile | None):
+        super().__init__()
+        self.scaled = scaled
+        self.assets_dir = assets_dir
+        self.name = name
+        self.pack = pack
+
+    def run(self):
+        self.scaled.decode(self.assets_dir, self.name, self.pack)
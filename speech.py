@@ -0,0 +1,269 @@
+"""
+Offline text-to-speech for Buddy.say.
+
+Synthesis runs on one worker thread and rendered audio is cached on disk
+by backend, voice and text, so a phrase is synthesised once and plays
+instantly after that; the least recently used phrases are deleted once the
+cache outgrows CACHE_MAX_BYTES. Requests wait in a bounded queue; when a burst
+overflows it the oldest waiting request is dropped and its bubble shows
+without audio.
+"""
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import wave
+from collections import deque
+from pathlib import Path
+from typing import Callable
+
+from PySide6.QtCore import QObject, QProcess, QStandardPaths, QUrl, Signal
+
+try:
+    from PySide6.QtMultimedia import QSoundEffect
+except ImportError:  # PySide6-Essentials ships without QtMultimedia
+    QSoundEffect = None
+
+# Called on the GUI thread with the audio file once playback has started,
+# or None if there is no audio for this request
+ReadyFn = Callable[["Path | None"], None]
+
+# Disk space rendered phrases may take before the oldest are deleted
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class SpeechBackend:
+    """Turns text into WAV bytes. Runs on the speech worker thread."""
+
+    name = "none"
+
+    def available(self) -> bool:
+        return True
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        raise NotImplementedError
+
+
+class EspeakBackend(SpeechBackend):
+    """espeak-ng (or classic espeak) writing WAV to stdout."""
+
+    name = "espeak"
+
+    def __init__(self, executable: str | None = None):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self) -> bool:
+        return self.executable is not None
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        result = subprocess.run(
+            [self.executable, "-v", voice, "--stdout", "--stdin"],
+            input=text.encode("utf-8"), capture_output=True, timeout=30, check=True,
+        )
+        return result.stdout
+
+
+class StubBackend(SpeechBackend):
+    """Silent WAV as long as the text would take to say. For tests."""
+
+    name = "stub"
+    RATE = 8000
+    MS_PER_CHAR = 60
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        frames = self.RATE * self.MS_PER_CHAR * max(1, len(text)) // 1000
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.RATE)
+            w.writeframes(b"\0\0" * frames)
+        return buf.getvalue()
+
+
+BACKENDS: dict[str, type[SpeechBackend]] = {"espeak": EspeakBackend, "stub": StubBackend}
+
+
+def default_cache_dir() -> Path:
+    return Path(QStandardPaths.writableLocation(QStandardPaths.CacheLocation)) / "speech"
+
+
+class _Player:
+    """Plays a WAV file without blocking: QtMultimedia if present, else a command-line player."""
+
+    COMMANDS = (["paplay"], ["aplay", "-q"], ["afplay"])
+
+    def __init__(self, parent: QObject):
+        self.parent = parent
+        self.effect = None
+        self.command = None
+        if QSoundEffect is None:
+            self.command = next((cmd for cmd in self.COMMANDS if shutil.which(cmd[0])), None)
+
+    def available(self) -> bool:
+        return QSoundEffect is not None or self.command is not None
+
+    def play(self, path: Path):
+        if QSoundEffect is not None:
+            # One effect for every utterance; a new source cuts off the last
+            if self.effect is None:
+                self.effect = QSoundEffect(self.parent)
+            self.effect.stop()
+            self.effect.setSource(QUrl.fromLocalFile(str(path)))
+            self.effect.play()
+        elif self.command is not None:
+            QProcess.startDetached(self.command[0], [*self.command[1:], str(path)])
+
+
+class Speaker(QObject):
+    """
+    Speaks text through a SpeechBackend. speak() returns at once; on_ready
+    runs on the GUI thread when playback starts (immediately for cached
+    phrases), so callers can show their bubble in step with the audio.
+    """
+
+    _done = Signal(int, object)
+
+    def __init__(
+        self,
+        backend: SpeechBackend,
+        voice: str = "en",
+        cache_dir: Path | None = None,
+        queue_size: int = 8,
+        cache_max_bytes: int = CACHE_MAX_BYTES,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.backend = backend
+        self.voice = voice
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.cache_max_bytes = cache_max_bytes
+        self.player = _Player(self)
+
+        self._waiting: dict[int, ReadyFn] = {}
+        self._next_id = 0
+        self._queue: deque[tuple[int, str, Path]] = deque()
+        self._queue_size = queue_size
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._done.connect(self._on_done)
+
+        self._thread = threading.Thread(target=self._work, name="speech", daemon=True)
+        self._thread.start()
+
+    def cache_path(self, text: str) -> Path:
+        key = hashlib.sha1(f"{self.backend.name}\0{self.voice}\0{text}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.wav"
+
+    def speak(self, text: str, on_ready: ReadyFn):
+        path = self.cache_path(text)
+        if path.exists():
+            try:
+                os.utime(path)  # the mtime orders the cache by last use
+            except OSError:
+                pass
+            self._start(path, on_ready)
+            return
+
+        request = self._next_id
+        self._next_id += 1
+        self._waiting[request] = on_ready
+        dropped = None
+        with self._cond:
+            if len(self._queue) >= self._queue_size:
+                dropped, _, _ = self._queue.popleft()
+            self._queue.append((request, text, path))
+            self._cond.notify()
+        if dropped is not None:
+            self._on_done(dropped, None)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                request, text, path = self._queue.popleft()
+
+            result = None
+            try:
+                if not path.exists():
+                    audio = self.backend.synthesize(text, self.voice)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(".tmp")
+                    tmp.write_bytes(audio)
+                    tmp.replace(path)
+                    self._prune_cache(keep=path)
+                result = path
+            except Exception as error:
+                # No audio for this one; the bubble still shows, and the
+                # worker stays up for the next request
+                print(f"speech: could not synthesize {text!r}: {error!r}", file=sys.stderr)
+
+            try:
+                self._done.emit(request, result)
+            except RuntimeError:
+                return  # speaker was destroyed (app quitting)
+
+    def _prune_cache(self, keep: Path):
+        """Delete the least recently used phrases until the cache fits in cache_max_bytes."""
+        files = []
+        for p in self.cache_dir.glob("*.wav"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.cache_max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def _on_done(self, request: int, path: Path | None):
+        on_ready = self._waiting.pop(request, None)
+        if on_ready is None:
+            return
+        if path is None:
+            on_ready(None)
+        else:
+            self._start(path, on_ready)
+
+    def _start(self, path: Path, on_ready: ReadyFn):
+        self.player.play(path)
+        on_ready(path)
+
+
+def make_speaker(kind: str, voice: str = "en", parent=None) -> Speaker | None:
+    """
+    A Speaker for the named backend ("espeak", "stub"), the first one that
+    works for "auto", or None for "off" or when nothing can speak here.
+    """
+    if kind == "off":
+        return None
+    names = ["espeak"] if kind == "auto" else [kind]
+    for name in names:
+        backend = BACKENDS[name]()
+        if backend.available():
+            speaker = Speaker(backend, voice, parent=parent)
+            if kind == "auto" and not speaker.player.available():
+                speaker.stop()
+                return None
+            return speaker
+    return None
@@ -0,0 +1,618 @@
+import hashlib
+import json
+import mmap
+import re
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QPoint, QRect, QRunnable, QSize, Qt, QThreadPool, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QRegion
+
+import startup_profile
+
+# Frame table version written by tools/pack_atlas.py
+ATLAS_VERSION = 2
+
+# Format of pixmaps with alpha on this platform. Decoded images are
+# converted to it on the decoding thread, so QPixmap.fromImage is a plain
+# copy and blits never convert. FrameStore asks the platform on creation.
+_pixmap_format = QImage.Format_ARGB32_Premultiplied
+
+
+@dataclass(frozen=True)
+class Patch:
+    """A changed canvas rectangle of a delta frame."""
+    pixmap: QPixmap
+    rect: QRect       # source rect inside pixmap
+    pos: QPoint       # top-left on the canvas
+
+
+@dataclass(frozen=True)
+class Frame:
+    """
+    One animation frame: a sub-rect of a (possibly shared) pixmap.
+
+    Delta frames (from a pack built with changed-rect encoding) have a null
+    pixmap and instead carry patches that overwrite parts of the previous
+    frame; their rect is the patched area in canvas coordinates.
+
+    mask is the frame's non-transparent area in canvas coordinates, used for
+    the window shape and hit tests.
+    """
+    pixmap: QPixmap   # standalone frame or a whole atlas sheet
+    rect: QRect       # source rect inside pixmap
+    offset: QPoint    # top-left of rect on the untrimmed canvas
+    canvas: QSize     # untrimmed frame size
+    duration: int = 0  # ms, 0 = animation default
+    patches: tuple[Patch, ...] = ()
+    mask: QRegion = field(default_factory=QRegion)
+    ticks: int = 1     # default frame lengths a 0 duration stands for (held poses)
+
+    @property
+    def size(self) -> QSize:
+        """Size on the canvas; rect counts device pixels of high-DPI pixmaps."""
+        return self.rect.size() / self.pixmap.devicePixelRatio()
+
+
+@dataclass
+class FrameSpec:
+    """A decoded frame that still refers to its images by key."""
+    key: str | None   # None for delta frames
+    rect: QRect
+    offset: QPoint
+    canvas: QSize
+    duration: int = 0
+    patches: list[tuple[str, QRect, QPoint]] = field(default_factory=list)  # (key, source rect, pos)
+    mask: QRegion | None = None  # canvas coordinates; None = derive from the pixels
+    ticks: int = 1
+
+
+@dataclass
+class Decoded:
+    """
+    An animation decoded to QImages. Safe to build off the GUI thread;
+    FrameStore turns it into pixmap-backed Frames on the GUI thread.
+    Images are keyed by content (file hash or sheet path) so identical
+    pictures end up as one shared pixmap.
+    """
+    images: dict[str, QImage]
+    frames: list[FrameSpec]
+
+
+def detect_pixmap_format() -> QImage.Format:
+    """Ask the platform which format alpha pixmaps are kept in. GUI thread only."""
+    global _pixmap_format
+    pix = QPixmap(1, 1)
+    pix.fill(Qt.transparent)
+    _pixmap_format = pix.toImage().format()
+    return _pixmap_format
+
+
+def pixmap_format() -> QImage.Format:
+    return _pixmap_format
+
+
+def prepared(img: QImage) -> QImage:
+    """
+    img converted in place to the pixmap format, or to RGB32 if it is
+    opaque. Indexed PNGs (tools/index_frames.py) decode to Indexed8 and
+    are expanded here too.
+    """
+    target = _pixmap_format if img.hasAlphaChannel() else QImage.Format_RGB32
+    if img.format() != target:
+        img.convertTo(target)
+    return img
+
+
+def read_image(source: Path | bytes) -> QImage:
+    """
+    Decode a file (or its bytes), ready for QPixmap.fromImage. Runs on pool
+    threads, so it sticks to QImage: a QImageReader over a QBuffer there
+    can deadlock against QImageReader use on the GUI thread.
+    """
+    img = QImage.fromData(source) if isinstance(source, bytes) else QImage(str(source))
+    return prepared(img) if not img.isNull() else img
+
+
+def image_size(data: bytes) -> QSize:
+    """Size of an encoded image without decoding it: read from a PNG header, else decoded."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+        return QSize(*struct.unpack(">II", data[16:24]))
+    return QImage.fromData(data).size()
+
+
+def parse_mask(text: str, offset: QPoint = QPoint(0, 0)) -> QRegion:
+    """QRegion of a mask written by tools/trim_frames.mask_bands."""
+    region = QRegion()
+    for band in text.split(";"):
+        if not band:
+            continue
+        top, bottom, *xs = map(int, band.split(","))
+        for x0, x1 in zip(xs[::2], xs[1::2]):
+            region += QRect(offset.x() + x0, offset.y() + top, x1 - x0, bottom - top)
+    return region
+
+
+def alpha_bands(img: QImage) -> str:
+    """
+    Mask of img's non-transparent pixels, in the band format of
+    tools/trim_frames.mask_bands. Unlike QPixmap.mask() it works on any
+    thread.
+    """
+    alpha = img.convertToFormat(QImage.Format_Alpha8)
+    data = bytes(alpha.constBits())
+    w, h, stride = alpha.width(), alpha.height(), alpha.bytesPerLine()
+
+    bands: list[list[int]] = []
+    prev: list[int] | None = None
+    for y in range(h):
+        row = data[y * stride:y * stride + w]
+        spans = [x for m in re.finditer(rb"[^\x00]+", row) for x in m.span()]
+        if spans and spans == prev:
+            bands[-1][1] = y + 1
+        elif spans:
+            bands.append([y, y + 1, *spans])
+        prev = spans
+    return ";".join(",".join(map(str, band)) for band in bands)
+
+
+def alpha_mask(pix: QPixmap, rect: QRect, offset: QPoint) -> QRegion:
+    """Mask of a frame whose assets carry none, read from its pixels."""
+    if not pix.hasAlpha():
+        return QRegion(QRect(offset, rect.size()))
+    return parse_mask(alpha_bands(pix.toImage().copy(rect)), offset)
+
+
+def frame_from_pixmap(pix: QPixmap) -> Frame:
+    return Frame(pix, pix.rect(), QPoint(0, 0), pix.size(), mask=alpha_mask(pix, pix.rect(), QPoint(0, 0)))
+
+
+def frame_paths(folder: Path) -> list[Path]:
+    order_file = folder / "order.txt"
+
+    paths: list[Path] = []
+    if order_file.exists():
+        for line in order_file.read_text(encoding="utf-8").splitlines():
+            name = line.strip()
+            if not name or name.startswith("#"):
+                continue
+            paths.append(folder / name)
+    else:
+        paths = sorted(folder.glob("*.png"))
+
+    return paths
+
+
+def read_table(table_path: Path, version: int = 1) -> dict | None:
+    try:
+        table = json.loads(table_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if table.get("version") != version:
+        return None
+    return table
+
+
+def decode_loose(folder: Path, skip: set[str] = frozenset()) -> Decoded:
+    # Folders trimmed by tools/trim_frames.py record each frame's offset
+    # inside the original canvas
+    trim = read_table(folder / "frames.json")
+
+    images: dict[str, QImage] = {}
+    frames = []
+    for p in frame_paths(folder):
+        with startup_profile.decoding(str(p)):
+            try:
+                data = p.read_bytes()
+            except OSError:
+                continue
+
+            # Byte-identical files (held poses, shared frames) decode once
+            key = hashlib.sha1(data).hexdigest()
+            img = images.get(key)
+            if img is None and key not in skip:
+                img = read_image(data)
+                if img.isNull():
+                    continue
+                images[key] = img
+
+        size = img.size() if img is not None else image_size(data)
+        offset, canvas, mask = QPoint(0, 0), size, None
+        entry = trim["frames"].get(p.name) if trim else None
+        if entry is not None:
+            offset, canvas = QPoint(*entry["offset"]), QSize(*trim["canvas"])
+            if "mask" in entry:
+                mask = parse_mask(entry["mask"], offset)
+        if mask is None and img is not None:
+            # Read it from the pixels here, on the decode thread, rather
+            # than from the pixmap on the GUI thread
+            mask = parse_mask(alpha_bands(img), offset)
+
+        frames.append(FrameSpec(key, QRect(QPoint(0, 0), size), offset, canvas, mask=mask))
+
+    return Decoded(images, frames)
+
+
+def decode_atlas(table_path: Path, skip: set[str] = frozenset()) -> Decoded | None:
+    """
+    Decode frames packed by tools/pack_atlas.py. Frames point into one or
+    more shared sheets. Returns None if the atlas is missing or unreadable
+    so the caller can fall back to loose files.
+    """
+    table = read_table(table_path, version=ATLAS_VERSION)
+    if table is None:
+        return None
+
+    keys = [str(table_path.with_name(sheet)) for sheet in table["sheets"]]
+    images: dict[str, QImage] = {}
+    for key in keys:
+        if key in skip:
+            continue
+        with startup_profile.decoding(key):
+            sheet = read_image(Path(key))
+        if sheet.isNull():
+            return None
+        images[key] = sheet
+
+    canvas = QSize(*table["canvas"])
+    sprites = [(keys[sheet], QRect(x, y, w, h)) for sheet, x, y, w, h in table["sprites"]]
+    masks = table.get("masks")
+    frames = []
+    for f in table["frames"]:
+        key, rect = sprites[f["sprite"]]
+        offset = QPoint(*f["offset"])
+        mask = parse_mask(masks[f["sprite"]], offset) if masks else None
+        frames.append(FrameSpec(key, rect, offset, canvas, f.get("duration", 0), mask=mask, ticks=f.get("ticks", 1)))
+
+    return Decoded(images, frames)
+
+
+class PackFile:
+    """
+    Memory-mapped animation pack written by tools/build_pack.py. Raw pixel
+    blocks are handed to QImage straight from the map, so loading an
+    animation costs no per-file opens or reads.
+    """
+
+    HEADER = struct.Struct("<4sII")
+
+    def __init__(self, path: Path, mm: mmap.mmap, index: dict, data_start: int):
+        self.path = path
+        self.index = index
+        self._mm = mm
+        self._view = memoryview(mm)
+        self._data_start = data_start
+
+    @classmethod
+    def open(cls, path: Path) -> "PackFile | None":
+        # Blocks hold ARGB32 in little-endian memory order
+        if sys.byteorder != "little" or not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, index_len = cls.HEADER.unpack_from(mm, 0)
+            if magic != b"BZPK" or version not in (1, 2, 3):
+                return None
+            start = cls.HEADER.size
+            index = json.loads(mm[start:start + index_len].decode("utf-8"))
+        except (OSError, ValueError, struct.error):
+            return None
+
+        data_start = -(-(start + index_len) // 16) * 16
+        return cls(path, mm, index, data_start)
+
+    def names(self) -> list[str]:
+        return list(self.index["anims"])
+
+    def canvas(self, name: str) -> QSize | None:
+        anim = self.index["anims"].get(name)
+        return QSize(*anim["canvas"]) if anim else None
+
+    def image(self, i: int) -> QImage:
+        entry = self.index["images"][i]
+        w, h = entry["size"]
+        start = self._data_start + entry["offset"]
+        block = self._view[start:start + entry["length"]]
+        if entry["codec"] == "zlib":
+            block = zlib.decompress(block)
+        # Converting gives the image its own pixels, independent of the
+        # map and of the decompressed bytes
+        return QImage(block, w, h, w * 4, QImage.Format_ARGB32).convertToFormat(_pixmap_format)
+
+    def decode(self, name: str, skip: set[str] = frozenset()) -> Decoded | None:
+        anim = self.index["anims"].get(name)
+        if anim is None:
+            return None
+
+        canvas = QSize(*anim["canvas"])
+        images: dict[str, QImage] = {}
+
+        def use(i: int) -> tuple[str, QRect]:
+            key = f"{self.path}:{i}"
+            if key not in images and key not in skip:
+                with startup_profile.decoding(key):
+                    images[key] = self.image(i)
+            w, h = self.index["images"][i]["size"]
+            return key, QRect(0, 0, w, h)
+
+        frames = []
+        for f in anim["frames"]:
+            if "patches" in f:
+                patches = []
+                area = QRect()
+                for i, *place in f["patches"]:
+                    key, rect = use(i)
+                    # [image, x, y] before version 3, then [sheet, sx, sy, w, h, x, y]
+                    if len(place) == 6:
+                        sx, sy, w, h, x, y = place
+                        rect = QRect(sx, sy, w, h)
+                    else:
+                        x, y = place
+                    patches.append((key, rect, QPoint(x, y)))
+                    area = area.united(QRect(QPoint(x, y), rect.size()))
+                # Packs from before masks: the whole canvas stays clickable
+                mask = parse_mask(f["mask"]) if "mask" in f else QRegion(QRect(QPoint(0, 0), canvas))
+                frames.append(FrameSpec(None, area, QPoint(0, 0), canvas, f.get("duration", 0), patches, mask, f.get("ticks", 1)))
+            else:
+                key, rect = use(f["image"])
+                offset = QPoint(*f["offset"])
+                mask = parse_mask(f["mask"], offset) if "mask" in f else None
+                frames.append(FrameSpec(key, rect, offset, canvas, f.get("duration", 0), mask=mask, ticks=f.get("ticks", 1)))
+
+        return Decoded(images, frames)
+
+
+def decode_animation(
+    assets_dir: Path,
+    name: str,
+    skip: set[str] = frozenset(),
+    pack: PackFile | None = None,
+) -> Decoded:
+    """
+    Decode one animation from the pack if there is one, else its atlas,
+    else its loose folder. Images whose key is in skip are already
+    resident and are not decoded again.
+    """
+    with startup_profile.phase(f"decode {name}"):
+        return _decode_animation(assets_dir, name, skip, pack)
+
+
+def _decode_animation(assets_dir: Path, name: str, skip: set[str], pack: PackFile | None) -> Decoded:
+    if pack is not None:
+        decoded = pack.decode(name, skip)
+        if decoded is not None and decoded.frames:
+            return decoded
+
+    table = assets_dir / "atlas" / f"{name}.json"
+    if table.exists():
+        decoded = decode_atlas(table, skip)
+        if decoded is not None and decoded.frames:
+            return decoded
+
+    return decode_loose(assets_dir / "sprites" / name, skip)
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, store: "FrameStore", name: str):
+        super().__init__()
+        self.decode = store.decode
+        self.skip = set(store._pixmaps)
+        self.done = store._decoded
+        self.name = name
+
+    def run(self):
+        decoded = self.decode(self.name, self.skip)
+        try:
+            self.done.emit(self.name, decoded)
+        except RuntimeError:
+            pass  # store was destroyed (app quitting) while we decoded
+
+
+class FrameStore(QObject):
+    """
+    Animation frames keyed by name, decoded on first use (or ahead of time
+    with prefetch()) and evicted least-recently-used once the decoded pixel
+    size goes over budget. Animations pinned by any owner are never
+    evicted.
+
+    Each unique image is held as a single pixmap shared by every animation
+    that uses it, and released when the last of them is evicted. Frames are
+    immutable, so one store can serve any number of buddies.
+
+    With a scaled.ScaledFrames, frames come zoomed and at the screen's
+    device pixel ratio; canvas sizes, offsets and masks are then logical
+    (zoomed) pixels.
+    """
+
+    loaded = Signal(str)
+    _decoded = Signal(str, object)
+
+    def __init__(self, assets_dir: Path, budget: int, parent=None, scaled: "ScaledFrames | None" = None):
+        super().__init__(parent)
+        self.assets_dir = assets_dir
+        self.pack = PackFile.open(assets_dir / "sprites.pack")
+        self.budget = budget
+        self.scaled = scaled
+        detect_pixmap_format()
+        self._pins: dict[object, set[str]] = {}
+
+        self._cache: OrderedDict[str, list[Frame]] = OrderedDict()
+        self._pixmaps: dict[str, QPixmap] = {}
+        self._users: dict[str, set[str]] = {}
+        # Masks of whole images, at the origin, for frames whose image was
+        # already resident and so skipped (and left without a mask) by decode
+        self._masks: dict[str, QRegion] = {}
+        self._pending: set[str] = set()
+        self._decoded.connect(self._on_decoded)
+
+    def names(self) -> list[str]:
+        names: set[str] = set()
+
+        sprites_dir = self.assets_dir / "sprites"
+        if sprites_dir.exists():
+            names.update(p.name for p in sprites_dir.iterdir() if p.is_dir())
+
+        # Packed animations may ship without their loose folders
+        atlas_dir = self.assets_dir / "atlas"
+        if atlas_dir.exists():
+            names.update(p.stem for p in atlas_dir.glob("*.json"))
+        if self.pack is not None:
+            names.update(self.pack.names())
+
+        return sorted(names)
+
+    @property
+    def zoom(self) -> float:
+        return self.scaled.zoom if self.scaled is not None else 1.0
+
+    @property
+    def dpr(self) -> float:
+        return self.scaled.dpr if self.scaled is not None else 1.0
+
+    def decode(self, name: str, skip: set[str] = frozenset()) -> Decoded:
+        """Decode name at the store's scale. Safe to call off the GUI thread."""
+        if self.scaled is not None:
+            return self.scaled.decode(self.assets_dir, name, self.pack)
+        return decode_animation(self.assets_dir, name, skip, self.pack)
+
+    def canvas_size(self, names: list[str]) -> tuple[int, int]:
+        """
+        Largest frame canvas across names, read from the pack index, atlas
+        and trim tables or PNG headers so nothing has to be decoded.
+        """
+        max_w = 1
+        max_h = 1
+        for name in names:
+            sizes: list[QSize] = []
+            canvas = self.pack.canvas(name) if self.pack is not None else None
+            if canvas is not None:
+                max_w = max(max_w, canvas.width())
+                max_h = max(max_h, canvas.height())
+                continue
+
+            table = (
+                read_table(self.assets_dir / "atlas" / f"{name}.json", version=ATLAS_VERSION)
+                or read_table(self.assets_dir / "sprites" / name / "frames.json")
+            )
+            if table is not None:
+                sizes.append(QSize(*table["canvas"]))
+            else:
+                for p in frame_paths(self.assets_dir / "sprites" / name):
+                    size = QImageReader(str(p)).size()
+                    if size.isValid():
+                        sizes.append(size)
+
+            for size in sizes:
+                max_w = max(max_w, size.width())
+                max_h = max(max_h, size.height())
+        if self.scaled is not None:
+            canvas = self.scaled.canvas(QSize(max_w, max_h))
+            return canvas.width(), canvas.height()
+        return max_w, max_h
+
+    @property
+    def pinned(self) -> set[str]:
+        return set().union(*self._pins.values())
+
+    def pin(self, owner: object, names: set[str]):
+        """Keep names resident on behalf of owner, replacing its earlier pins."""
+        self._pins[owner] = set(names)
+
+    def unpin(self, owner: object):
+        self._pins.pop(owner, None)
+
+    def release_unpinned(self):
+        """Evict everything nobody has pinned, whatever the budget."""
+        pinned = self.pinned
+        for name in list(self._cache):
+            if name not in pinned:
+                self._drop(name)
+
+    def get(self, name: str) -> list[Frame]:
+        frames = self._cache.get(name)
+        if frames is None:
+            with startup_profile.phase(f"load {name}"):
+                decoded = self.decode(name, set(self._pixmaps))
+                frames = self._insert(name, decoded)
+        else:
+            self._cache.move_to_end(name)
+        return frames
+
+    def prefetch(self, name: str):
+        if name in self._cache or name in self._pending:
+            return
+        self._pending.add(name)
+        QThreadPool.globalInstance().start(_DecodeTask(self, name))
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._cache
+
+    def resident_bytes(self) -> int:
+        return sum(pix.width() * pix.height() * pix.depth() // 8 for pix in self._pixmaps.values())
+
+    def pixmap_count(self) -> int:
+        return len(self._pixmaps)
+
+    def _on_decoded(self, name: str, decoded: Decoded):
+        self._pending.discard(name)
+        if name not in self._cache:
+            self._insert(name, decoded)
+        self.loaded.emit(name)
+
+    def _insert(self, name: str, decoded: Decoded) -> list[Frame]:
+        keys = {spec.key for spec in decoded.frames if spec.key is not None}
+        keys.update(key for spec in decoded.frames for key, _, _ in spec.patches)
+        if any(key not in self._pixmaps and key not in decoded.images for key in keys):
+            # A shared image we skipped was evicted in the meantime
+            decoded = self.decode(name)
+
+        for key in keys:
+            if key not in self._pixmaps:
+                pix = QPixmap.fromImage(decoded.images[key])
+                pix.setDevicePixelRatio(self.dpr)
+                self._pixmaps[key] = pix
+            self._users.setdefault(key, set()).add(name)
+
+        frames = []
+        for spec in decoded.frames:
+            pix = self._pixmaps[spec.key] if spec.key is not None else QPixmap()
+            whole = spec.key is not None and spec.rect == pix.rect()
+            mask = spec.mask
+            if mask is None and whole and spec.key in self._masks:
+                mask = self._masks[spec.key].translated(spec.offset)
+            elif mask is None:
+                mask = alpha_mask(pix, spec.rect, spec.offset)
+            if whole and spec.key not in self._masks:
+                self._masks[spec.key] = mask.translated(-spec.offset)
+            frames.append(Frame(
+                pix, spec.rect, spec.offset, spec.canvas, spec.duration,
+                tuple(Patch(self._pixmaps[k], r, pos) for k, r, pos in spec.patches),
+                mask, spec.ticks,
+            ))
+
+        self._cache[name] = frames
+        self._evict(keep=name)
+        return frames
+
+    def _evict(self, keep: str):
+        pinned = self.pinned
+        for name in list(self._cache):
+            if self.resident_bytes() <= self.budget:
+                break
+            if name == keep or name in pinned:
+                continue
+            self._drop(name)
+
+    def _drop(self, name: str):
+        del self._cache[name]
+        for key, users in list(self._users.items()):
+            users.discard(name)
+            if not users:
+                del self._users[key]
+                del self._pixmaps[key]
+                self._masks.pop(key, None)
@@ -0,0 +1,121 @@
+"""
+Startup phase timings for main.py --profile-startup.
+
+Does nothing until start() is called, so the hooks left in the loading
+code cost one global lookup when profiling is off. Phases nest; decoded
+files are recorded from any thread.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+
+class _Profile:
+    def __init__(self, launched: float):
+        self.launched = launched
+        self.phases: list[tuple[int, str, float]] = []   # (depth, name, ms)
+        self.files: list[tuple[str, float, str]] = []    # (path, ms, thread)
+        self.depth = 0
+        self.lock = threading.Lock()
+
+
+_active: _Profile | None = None
+
+
+def process_age() -> float | None:
+    """Seconds since this process was started, where the OS tells us."""
+    try:
+        stat = Path("/proc/self/stat").read_text()
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+        # Fields after the parenthesised command name; starttime is field 22
+        started = int(stat.rsplit(")", 1)[1].split()[19])
+        return uptime - started / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def start(before_imports: float):
+    """
+    Begin profiling. before_imports is the perf_counter() reading taken
+    at the top of main.py, before PySide6 was imported.
+    """
+    global _active
+    now = time.perf_counter()
+    age = process_age()
+    launched = now - age if age is not None else before_imports
+    _active = _Profile(launched)
+    if age is not None:
+        _active.phases.append((0, "interpreter start", (before_imports - launched) * 1000))
+    _active.phases.append((0, "imports (PySide6 and app modules)", (now - before_imports) * 1000))
+
+
+def enabled() -> bool:
+    return _active is not None
+
+
+@contextmanager
+def _phase(profile: _Profile, name: str):
+    index = len(profile.phases)
+    profile.phases.append((profile.depth, name, 0.0))
+    profile.depth += 1
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        profile.phases[index] = (profile.depth, name, (time.perf_counter() - t) * 1000)
+
+
+def phase(name: str):
+    """Time a block on the GUI thread as a named (possibly nested) phase."""
+    profile = _active
+    if profile is None or threading.current_thread() is not threading.main_thread():
+        return nullcontext()
+    return _phase(profile, name)
+
+
+@contextmanager
+def _decoding(profile: _Profile, path: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t) * 1000
+        with profile.lock:
+            profile.files.append((path, ms, threading.current_thread().name))
+
+
+def decoding(path: str):
+    """Time reading and decoding one image file or pack block."""
+    profile = _active
+    if profile is None:
+        return nullcontext()
+    return _decoding(profile, path)
+
+
+def finish(label: str = "first paint", stream=None):
+    """Print the report and stop profiling."""
+    global _active
+    profile = _active
+    if profile is None:
+        return
+    _active = None
+    stream = stream or sys.stderr
+
+    total = (time.perf_counter() - profile.launched) * 1000
+    print("startup profile (ms)", file=stream)
+    for depth, name, ms in profile.phases:
+        print(f"  {'  ' * depth}{name:<{44 - 2 * depth}} {ms:9.1f}", file=stream)
+    print(f"  {label + ' (since launch)':<44} {total:9.1f}", file=stream)
+
+    with profile.lock:
+        files = sorted(profile.files, key=lambda f: f[1], reverse=True)
+    if files:
+        decode_ms = sum(ms for _, ms, _ in files)
+        print(f"decoded files: {len(files)}, {decode_ms:.1f} ms (slowest first)", file=stream)
+        for path, ms, thread in files:
+            where = "" if thread == threading.main_thread().name else "  [background]"
+            print(f"  {ms:9.2f}  {path}{where}", file=stream)
@@ -0,0 +1,85 @@
+from PySide6.QtCore import QPoint, QRect, QSize
+from PySide6.QtGui import QPixmap
+
+from animation import Timeline, coalesce
+from main import Buddy
+from sprites import Frame, Patch
+
+
+def test_position_wraps_around_loops():
+    timeline = Timeline([100, 200, 100], loop=True, start=1000.0)
+    assert [timeline.position(1000.0 + t) for t in (0, 99, 100, 299, 300, 399)] == [0, 0, 1, 1, 2, 2]
+    # Frame numbers keep counting up across loops
+    assert timeline.position(1400.0) == 3
+    assert timeline.position(1000.0 + 2 * 400 + 150) == 7
+    assert timeline.frame_end(7) == 1000.0 + 2 * 400 + 300
+
+
+def test_one_shot_ends():
+    timeline = Timeline([100, 100], loop=False, start=0.0)
+    assert timeline.position(199.0) == 1
+    assert timeline.position(200.0) is None
+
+
+def test_late_tick_skips_to_due_frame():
+    timeline = Timeline([100] * 5, loop=True, start=0.0)
+    # Frame 1 was due at 100; a tick 250 ms late finds frame 3 due
+    assert timeline.position(350.0) == 3
+    assert timeline.position(timeline.frame_end(2)) == 3
+
+
+def test_pause_does_not_count():
+    timeline = Timeline([100, 100], loop=True, start=0.0)
+    timeline.pause(150.0)
+    timeline.pause(170.0)  # a second pause keeps the first time
+    timeline.resume(1150.0)
+    assert timeline.start == 1000.0
+    assert timeline.position(1150.0) == 1
+    assert timeline.frame_end(1) == 1200.0
+    timeline.resume(5000.0)  # not paused: nothing moves
+    assert timeline.start == 1000.0
+
+
+def make_frame(pix: QPixmap, x: int, duration: int = 0, patches=()) -> Frame:
+    return Frame(pix, QRect(x, 0, 10, 10), QPoint(0, 0), QSize(10, 10), duration, patches)
+
+
+def test_coalesce_merges_held_frames(qapp):
+    sheet, other = QPixmap(30, 10), QPixmap(30, 10)
+    a, b = make_frame(sheet, 0), make_frame(sheet, 10, duration=50)
+    frames = [a, a, b, make_frame(sheet, 10), make_frame(other, 10), a]
+    out = coalesce(frames, 100)
+    assert [(f.rect.x(), f.duration) for f in out] == [(0, 200), (10, 150), (10, 100), (0, 100)]
+    assert out[2].pixmap.cacheKey() == other.cacheKey()
+
+
+def test_coalesce_keeps_delta_frames_apart(qapp):
+    patch = Patch(QPixmap(10, 10), QRect(0, 0, 10, 10), QPoint(0, 0))
+    delta = make_frame(QPixmap(), 0, patches=(patch,))
+    assert [f.duration for f in coalesce([delta, delta], 80)] == [80, 80]
+
+
+def test_dropped_frames_after_late_tick(qapp):
+    buddy = Buddy()
+    buddy.play("idle", loop=True)
+    n = len(buddy.current_frames)
+    buddy.anim_pos = 0
+    before = buddy.dropped_frames
+
+    # Due frames 1..4, only 4 shown: 1, 2 and 3 were dropped
+    buddy.advance_to(4)
+    assert buddy.dropped_frames - before == 3
+    assert buddy.anim_pos == 4 and buddy.anim_i == 4 % n
+
+    # Under a frame cap the tick planned for frame 7 skips 5 and 6 on
+    # purpose; only frame 7 missing counts
+    buddy.advance_to(8, planned=7)
+    assert buddy.dropped_frames - before == 4
+    buddy.deleteLater()
+
+
+def test_coalesce_scales_held_ticks_by_default(qapp):
+    # Atlas and pack frames store held poses as ticks, not milliseconds
+    sheet = QPixmap(30, 10)
+    held = Frame(sheet, QRect(0, 0, 10, 10), QPoint(0, 0), QSize(10, 10), ticks=3)
+    assert [f.duration for f in coalesce([held, make_frame(sheet, 10)], 120)] == [360, 120]
@@ -0,0 +1,102 @@
+import math
+import random
+
+import pytest
+from PIL import Image
+
+import blue_to_alpha
+from blue_to_alpha import SOFT, THRESH, blue_to_alpha_slow
+
+KEY = (20, 40, 230)
+
+
+def offset_by(key: tuple[int, int, int], d2: int) -> tuple[int, int, int] | None:
+    """A colour at exactly squared distance d2 from key, if one fits in 0..255 along some axis."""
+    d = math.isqrt(d2)
+    if d * d != d2:
+        return None
+    for axis in range(3):
+        for sign in (1, -1):
+            c = list(key)
+            c[axis] += sign * d
+            if 0 <= c[axis] <= 255:
+                return tuple(c)
+    return None
+
+
+def random_image(rng: random.Random, w: int, h: int) -> Image.Image:
+    """
+    Mostly colours near KEY (inside, on and around both band edges), some
+    arbitrary ones, with random alpha; the border is the key colour itself.
+    """
+    outer = THRESH + SOFT
+    edges = [offset_by(KEY, d * d) for d in (0, THRESH - 1, THRESH, THRESH + 1, outer - 1, outer, outer + 1)]
+    edges = [c for c in edges if c is not None]
+    pixels = []
+    for y in range(h):
+        for x in range(w):
+            if x in (0, w - 1) or y in (0, h - 1):
+                rgb = KEY
+            elif rng.random() < 0.3:
+                rgb = rng.choice(edges)
+            elif rng.random() < 0.5:
+                rgb = tuple(min(255, max(0, k + rng.randint(-outer - 5, outer + 5))) for k in KEY)
+            else:
+                rgb = tuple(rng.randrange(256) for _ in range(3))
+            pixels.append((*rgb, rng.choice((255, 255, rng.randrange(256)))))
+    img = Image.new("RGBA", (w, h))
+    img.putdata(pixels)
+    return img
+
+
+@pytest.mark.skipif(blue_to_alpha.np is None, reason="needs NumPy")
+@pytest.mark.parametrize("seed", range(4))
+def test_numpy_path_matches_reference(seed):
+    rng = random.Random(seed)
+    img = random_image(rng, rng.randint(1, 40), rng.randint(1, 40))
+    fast = blue_to_alpha.blue_to_alpha(img, KEY)
+    slow = blue_to_alpha_slow(img, KEY)
+    assert fast.mode == slow.mode == "RGBA"
+    assert fast.tobytes() == slow.tobytes()
+
+
+def write_frame(path, colour):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    img = Image.new("RGBA", (8, 8), (*KEY, 255))
+    img.putpixel((4, 4), colour)
+    img.save(path)
+
+
+def test_manifest_skips_unchanged_and_prunes_deleted(tmp_path, monkeypatch):
+    src, out = tmp_path / "raw", tmp_path / "clean"
+    write_frame(src / "idle" / "a.png", (255, 0, 0, 255))
+    write_frame(src / "idle" / "b.png", (0, 255, 0, 255))
+    write_frame(src / "wave" / "c.png", (255, 255, 0, 255))
+
+    keyed = []
+    key_file = blue_to_alpha.key_file
+
+    def counting(src_path, dst):
+        keyed.append(dst.relative_to(out).as_posix())
+        return key_file(src_path, dst)
+
+    monkeypatch.setattr(blue_to_alpha, "key_file", counting)
+
+    def run():
+        keyed.clear()
+        assert blue_to_alpha.process_folder(src, out, verbose=False) == []
+        return sorted(keyed)
+
+    assert run() == ["idle/a.png", "idle/b.png", "wave/c.png"]
+    assert run() == []
+
+    # New content is rekeyed; a new timestamp on the same bytes is not
+    write_frame(src / "idle" / "a.png", (0, 0, 0, 255))
+    (src / "idle" / "b.png").touch()
+    assert run() == ["idle/a.png"]
+
+    (src / "wave" / "c.png").unlink()
+    assert run() == []
+    assert not (out / "wave" / "c.png").exists()
+    assert (out / "idle" / "a.png").exists() and (out / "idle" / "b.png").exists()
+    assert set(blue_to_alpha.load_manifest(out)) == {"idle/a.png", "idle/b.png"}
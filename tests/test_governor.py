@@ -0,0 +1,16 @@
+from governor import Governor
+from lifecycle import FakeSessionProvider, Lifecycle
+
+
+def test_polling_pauses_while_suspended(qapp, tmp_path):
+    provider = FakeSessionProvider()
+    lifecycle = Lifecycle(provider, idle_after_ms=0)
+    governor = Governor(root=tmp_path)
+    lifecycle.suspended_changed.connect(governor.set_suspended)
+    assert governor._poll.isActive()
+
+    provider.set_locked(True)
+    assert governor.suspended and not governor._poll.isActive()
+
+    provider.set_locked(False)
+    assert not governor.suspended and governor._poll.isActive()
@@ -0,0 +1,125 @@
+import shutil
+import subprocess
+
+import pytest
+from PySide6.QtCore import ClassInfo, QObject, Signal, Slot
+from PySide6.QtTest import QTest
+
+from lifecycle import DBusSessionProvider, FakeSessionProvider, Lifecycle, QDBusConnection
+from main import Buddy
+
+
+@pytest.fixture
+def buddy(qapp):
+    buddy = Buddy()
+    buddy.show()
+    qapp.processEvents()
+    yield buddy
+    buddy.close()
+    buddy.deleteLater()
+
+
+def running(buddy) -> bool:
+    return buddy.scheduler.is_scheduled(buddy.tick_anim) and buddy.behavior_timer.isActive()
+
+
+def stopped(buddy) -> bool:
+    return not buddy.scheduler.is_scheduled(buddy.tick_anim) and not buddy.behavior_timer.isActive()
+
+
+def test_lock_suspends_and_resumes(buddy):
+    provider = FakeSessionProvider()
+    lifecycle = Lifecycle(provider, idle_after_ms=0)
+    lifecycle.add(buddy)
+    states = []
+    lifecycle.suspended_changed.connect(states.append)
+    assert running(buddy)
+
+    provider.set_locked(True)
+    assert lifecycle.suspended and buddy.suspended
+    assert stopped(buddy)
+
+    provider.set_locked(False)
+    assert not lifecycle.suspended and not buddy.suspended
+    assert running(buddy)
+    assert states == [True, False]
+
+
+def test_idle_and_fullscreen_suspend(buddy):
+    provider = FakeSessionProvider()
+    lifecycle = Lifecycle(provider, idle_after_ms=60 * 1000)
+    lifecycle.add(buddy)
+
+    provider.set_idle_ms(60 * 1000)
+    assert lifecycle.suspended and stopped(buddy)
+    provider.set_idle_ms(0)
+    assert not lifecycle.suspended and running(buddy)
+
+    provider.set_fullscreen(True)
+    assert lifecycle.suspended and stopped(buddy)
+    provider.set_fullscreen(False)
+    assert running(buddy)
+
+
+@ClassInfo({"D-Bus Interface": DBusSessionProvider.SERVICE})
+class StubScreenSaver(QObject):
+    ActiveChanged = Signal(bool)
+
+    def __init__(self, active: bool):
+        super().__init__()
+        self.active = active
+
+    @Slot(result=bool)
+    def GetActive(self) -> bool:
+        return self.active
+
+    @Slot(result="uint")
+    def GetSessionIdleTime(self) -> int:
+        return 4242
+
+
+@pytest.fixture
+def bus(qapp):
+    if QDBusConnection is None or shutil.which("dbus-daemon") is None:
+        pytest.skip("needs QtDBus and dbus-daemon")
+    daemon = subprocess.Popen(
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    address = daemon.stdout.readline().strip()
+    # The stub is served on the provider's own connection: Qt delivers
+    # calls to its own names locally, so nothing blocks on a second thread
+    conn = QDBusConnection.connectToBus(address, f"test-bus-{daemon.pid}")
+    yield conn
+    QDBusConnection.disconnectFromBus(conn.name())
+    daemon.terminate()
+    daemon.wait()
+
+
+def test_dbus_provider_follows_screensaver(qapp, bus):
+    stub = StubScreenSaver(active=True)
+    assert bus.registerService(DBusSessionProvider.SERVICE)
+    assert bus.registerObject(DBusSessionProvider.PATH, stub,
+                              QDBusConnection.ExportAllSlots | QDBusConnection.ExportAllSignals)
+
+    provider = DBusSessionProvider(bus=bus)
+    assert provider.available()
+    assert provider.locked()
+    assert provider.idle_ms() == 4242
+
+    changes = []
+    provider.changed.connect(lambda: changes.append(provider.locked()))
+    stub.ActiveChanged.emit(False)
+    for _ in range(100):
+        if changes:
+            break
+        QTest.qWait(20)
+    assert changes == [False]
+    assert not provider.locked()
+
+
+def test_dbus_provider_without_service(qapp, bus):
+    provider = DBusSessionProvider(bus=bus)
+    assert not provider.available()
+    assert not provider.locked()
+    assert provider.idle_ms() == 0
@@ -0,0 +1,44 @@
+from PySide6.QtTest import QTest
+
+from speech import Speaker, StubBackend
+
+
+class FlakyBackend(StubBackend):
+    """Fails on text starting with "!", with an error no backend is expected to raise."""
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        if text.startswith("!"):
+            raise ValueError("bad text")
+        return super().synthesize(text, voice)
+
+
+def speak_all(speaker: Speaker, texts: list[str]) -> list:
+    results = []
+    for text in texts:
+        speaker.speak(text, results.append)
+    for _ in range(250):
+        if len(results) == len(texts):
+            break
+        QTest.qWait(20)
+    return results
+
+
+def test_worker_survives_backend_errors(qapp, tmp_path):
+    speaker = Speaker(FlakyBackend(), cache_dir=tmp_path)
+    results = speak_all(speaker, ["!oops", "hello"])
+    speaker.stop()
+    assert results == [None, speaker.cache_path("hello")]
+
+
+def test_cache_drops_least_recently_used(qapp, tmp_path):
+    # Each phrase renders to a few KB; the cap holds about two of them
+    size = len(StubBackend().synthesize("one", "en"))
+    speaker = Speaker(StubBackend(), cache_dir=tmp_path, cache_max_bytes=2 * size + size // 2)
+    speak_all(speaker, ["one"])
+    speak_all(speaker, ["two"])
+    speak_all(speaker, ["one"])  # cached; now used more recently than "two"
+    speak_all(speaker, ["six"])
+    speaker.stop()
+    assert speaker.cache_path("one").exists()
+    assert not speaker.cache_path("two").exists()
+    assert speaker.cache_path("six").exists()
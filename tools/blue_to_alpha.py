@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image
+import argparse
+import hashlib
+import json
 import math
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # fall back to the per-pixel path
+    np = None
 
 # Tuning knobs:
 THRESH = 35   # distance below this becomes fully transparent
 SOFT = 40     # feather range above THRESH (bigger = softer edges)
 
+# Written to the output folder so unchanged frames can be skipped
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
 
 def dist(rgb: tuple[int, int, int], key: tuple[int, int, int]) -> float:
     return math.sqrt(
@@ -51,6 +67,57 @@ def blue_to_alpha(img: Image.Image, key_rgb: tuple[int, int, int]) -> Image.Imag
     """
     Convert pixels close to key_rgb into transparency (alpha),
     with a feathered edge controlled by THRESH and SOFT.
+
+    Uses the NumPy engine when available, otherwise the per-pixel path.
+    Both produce identical output.
+    """
+    if np is None:
+        return blue_to_alpha_slow(img, key_rgb)
+
+    img = img.convert("RGBA")
+    arr = np.asarray(img)
+    r, g, b, a = arr.reshape(-1, 4).T
+
+    # Per-channel squared differences are integers, exactly as in dist()
+    levels = np.arange(256, dtype=np.int32)
+    d2 = (
+        np.take((levels - key_rgb[0]) ** 2, r) +
+        np.take((levels - key_rgb[1]) ** 2, g) +
+        np.take((levels - key_rgb[2]) ** 2, b)
+    )
+
+    # Squared distances at or beyond the feather band keep their alpha
+    lut = alpha_table(THRESH, SOFT)
+    np.minimum(d2, len(lut) - 1, out=d2)
+
+    out = arr.copy()
+    out.reshape(-1, 4)[:, 3] = np.minimum(a, np.take(lut, d2))
+    return Image.fromarray(out, "RGBA")
+
+
+@lru_cache(maxsize=None)
+def alpha_table(thresh: int, soft: int) -> "np.ndarray":
+    """
+    Alpha ceiling for every integer squared distance inside the feather band,
+    computed with dist()'s exact float math so results match the slow path.
+    The last entry (255) covers everything at or beyond THRESH + SOFT.
+    """
+    outer = thresh + soft
+    size = math.ceil(outer * outer) + 1
+    table = np.full(size, 255, dtype=np.uint8)
+    for d2 in range(size - 1):
+        d = math.sqrt(d2)
+        if d <= thresh:
+            table[d2] = 0
+        elif d < outer:
+            table[d2] = int(255 * ((d - thresh) / soft))
+
+    return table
+
+
+def blue_to_alpha_slow(img: Image.Image, key_rgb: tuple[int, int, int]) -> Image.Image:
+    """
+    Reference per-pixel implementation of blue_to_alpha.
     """
     img = img.convert("RGBA")
     px = img.load()
@@ -73,40 +140,190 @@ def blue_to_alpha(img: Image.Image, key_rgb: tuple[int, int, int]) -> Image.Imag
     return img
 
 
-def process_folder(in_dir: Path, out_dir: Path, verbose: bool = True) -> None:
+def key_file(src: Path, dst: Path) -> tuple[int, int, int]:
+    """
+    Key a single PNG and write the result to dst.
+    Returns the key colour that was used.
+    """
+    img = Image.open(src)
+    key = auto_key(img)
+    out = blue_to_alpha(img, key)
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    out.save(dst)
+    return key
+
+
+def _key_job(job: tuple[Path, Path]) -> tuple[tuple[int, int, int] | None, str | None]:
+    # Runs in a worker process; errors are returned so one bad frame
+    # doesn't abort the whole batch.
+    src, dst = job
+    try:
+        return key_file(src, dst), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def load_manifest(out_dir: Path) -> dict:
+    path = out_dir / MANIFEST_NAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("frames", {})
+
+
+def save_manifest(out_dir: Path, frames: dict) -> None:
+    path = out_dir / MANIFEST_NAME
+    data = {"version": MANIFEST_VERSION, "frames": dict(sorted(frames.items()))}
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+def is_current(entry: dict | None, src: Path, dst: Path) -> bool:
+    """
+    True if dst was keyed from src's current contents with today's knobs.
+    Size + mtime match short-circuits the content hash.
+    """
+    if not entry or not dst.exists():
+        return False
+    if entry.get("thresh") != THRESH or entry.get("soft") != SOFT:
+        return False
+
+    st = src.stat()
+    if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    if entry.get("sha1") != file_hash(src):
+        return False
+
+    # Same bytes, new timestamp (fresh checkout etc.) - remember the new stat
+    entry["size"] = st.st_size
+    entry["mtime_ns"] = st.st_mtime_ns
+    return True
+
+
+def process_folder(
+    in_dir: Path,
+    out_dir: Path,
+    verbose: bool = True,
+    jobs: int = 1,
+    force: bool = False,
+) -> list[tuple[Path, str]]:
     """
     Recursively process all PNGs in in_dir, write results to out_dir
     while preserving subfolder structure.
+
+    A manifest in out_dir records each source's hash, key colour and the
+    THRESH/SOFT used, so unchanged frames are skipped on the next run and
+    outputs whose source was deleted are pruned. force=True rekeys all.
+
+    jobs > 1 spreads frames over a process pool (0 = one per CPU).
+    Progress is still reported in input order. Returns (path, error)
+    for every frame that failed; the rest of the batch is written.
     """
     if not in_dir.exists():
         raise FileNotFoundError(f"Input folder does not exist: {in_dir}")
 
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    pngs = list(in_dir.rglob("*.png"))
+    pngs = sorted(in_dir.rglob("*.png"))
     if verbose:
         print(f"Found {len(pngs)} PNG(s) under {in_dir}")
 
+    old = load_manifest(out_dir)
+    manifest: dict[str, dict] = {}
+    batch: list[tuple[Path, Path]] = []
+
     for p in pngs:
-        img = Image.open(p)
-        key = auto_key(img)
+        rel = p.relative_to(in_dir).as_posix()
+        # Preserve relative structure
+        dst = out_dir / rel
+        entry = old.pop(rel, None)
+        if not force and is_current(entry, p, dst):
+            manifest[rel] = entry
+        else:
+            batch.append((p, dst))
 
+    # Whatever is left in the old manifest no longer has a source
+    for rel in old:
+        stale = out_dir / rel
+        if stale.exists():
+            stale.unlink()
+            if verbose:
+                print(f"{rel}  pruned")
+
+    if verbose:
+        print(f"{len(pngs) - len(batch)} up to date, {len(batch)} to key")
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    failed: list[tuple[Path, str]] = []
+
+    def report(src: Path, key, error) -> None:
+        rel = src.relative_to(in_dir)
+        if error is not None:
+            failed.append((src, error))
+            print(f"{rel}  FAILED: {error}", file=sys.stderr)
+            return
+
+        st = src.stat()
+        manifest[rel.as_posix()] = {
+            "sha1": file_hash(src),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "key": list(key),
+            "thresh": THRESH,
+            "soft": SOFT,
+        }
         if verbose:
-            rel = p.relative_to(in_dir)
             print(f"{rel}  key={key}")
 
-        out = blue_to_alpha(img, key)
+    try:
+        if jobs == 1 or len(batch) < 2:
+            for job in batch:
+                report(job[0], *_key_job(job))
+        else:
+            chunk = max(1, len(batch) // (jobs * 8))
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                for job, (key, error) in zip(batch, pool.map(_key_job, batch, chunksize=chunk)):
+                    report(job[0], key, error)
+    finally:
+        # Keep whatever finished, even if the run was interrupted
+        save_manifest(out_dir, manifest)
 
-        # Preserve relative structure
-        rel = p.relative_to(in_dir)
-        out_path = out_dir / rel
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        out.save(out_path)
+    return failed
 
 
-if __name__ == "__main__":
-    raw = Path("assets/sprites_raw")
-    clean = Path("assets/sprites_clean")
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Key the sprite background colour out to alpha.")
+    parser.add_argument("in_dir", nargs="?", type=Path, default=Path("assets/sprites_raw"))
+    parser.add_argument("out_dir", nargs="?", type=Path, default=Path("assets/sprites_clean"))
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes (0 = one per CPU)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="ignore the manifest and rekey every frame")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    failed = process_folder(
+        args.in_dir, args.out_dir,
+        verbose=not args.quiet, jobs=args.jobs, force=args.force,
+    )
+    if failed:
+        print(f"{len(failed)} file(s) failed", file=sys.stderr)
+        return 1
 
-    process_folder(raw, clean, verbose=True)
     print("done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+import struct
+import sys
+import zlib
+
+from PIL import Image, ImageChops
+
+from pack_atlas import Animation, collect, image_hash, shelf_pack
+from trim_frames import mask_bands
+
+# Layout (all integers little-endian):
+#   magic    4s   b"BZPK"
+#   version  u32
+#   index    u32  length of the JSON index that follows
+#   index    JSON {"images": [...], "anims": {...}}
+#   blocks   pixel data, each block starting on a BLOCK_ALIGN boundary;
+#            image offsets in the index are relative to the first block
+#
+# Pixels are straight-alpha ARGB32 as Qt stores it in memory on
+# little-endian machines (B, G, R, A bytes), so raw blocks can be wrapped
+# in a QImage straight from the memory map.
+#
+# A frame is either a keyframe {"image", "offset"} that replaces the canvas,
+# or a delta {"patches": [[image, sx, sy, w, h, x, y], ...]} whose source
+# rectangles overwrite just those canvas rectangles (alpha included) on top
+# of the previous frame. All patches of one animation share one image.
+# Each frame also has a hit-test "mask" (see trim_frames.mask_bands) placed
+# at its offset; a delta's covers the whole composed canvas.
+MAGIC = b"BZPK"
+PACK_VERSION = 3
+HEADER = struct.Struct("<4sII")
+BLOCK_ALIGN = 16
+
+TILE = 8              # granularity of the frame-to-frame change search
+DELTA_MAX_AREA = 0.8   # delta only if patches cover less than this share of a keyframe
+# Bytes an image adds to a pack besides its pixels (index entry, alignment)
+IMAGE_OVERHEAD = 48
+
+
+def align(n: int) -> int:
+    return (n + BLOCK_ALIGN - 1) // BLOCK_ALIGN * BLOCK_ALIGN
+
+
+def canvas_image(img: Image.Image, offset: tuple[int, int], canvas: tuple[int, int]) -> Image.Image:
+    full = Image.new("RGBA", canvas, (0, 0, 0, 0))
+    full.paste(img, offset)
+    return full
+
+
+def changed_rects(prev: Image.Image, cur: Image.Image) -> list[tuple[int, int, int, int]]:
+    """
+    Rectangles (left, top, right, bottom) covering every pixel that differs
+    between two canvas images. Changes are found per TILE square; adjacent
+    changed tiles in a row merge, then rows with the same tile span merge.
+    """
+    diff = ImageChops.difference(prev, cur)
+    w, h = diff.size
+
+    rows: list[list[tuple[int, int, list[int]]]] = []
+    for ty in range(0, h, TILE):
+        runs: list[tuple[int, int, list[int]]] = []
+        for tx in range(0, w, TILE):
+            bbox = diff.crop((tx, ty, min(tx + TILE, w), min(ty + TILE, h))).getbbox(alpha_only=False)
+            if bbox is None:
+                continue
+            box = [tx + bbox[0], ty + bbox[1], tx + bbox[2], ty + bbox[3]]
+            col = tx // TILE
+            if runs and runs[-1][1] == col - 1:
+                first, _, run = runs[-1]
+                run[0] = min(run[0], box[0])
+                run[1] = min(run[1], box[1])
+                run[2] = max(run[2], box[2])
+                run[3] = max(run[3], box[3])
+                runs[-1] = (first, col, run)
+            else:
+                runs.append((col, col, box))
+        rows.append(runs)
+
+    rects: list[tuple[int, int, list[int]]] = []
+    open_rects: dict[tuple[int, int], list[int]] = {}
+    for runs in rows:
+        next_open: dict[tuple[int, int], list[int]] = {}
+        for first, last, box in runs:
+            above = open_rects.get((first, last))
+            if above is not None:
+                above[1] = min(above[1], box[1])
+                above[2] = max(above[2], box[2])
+                above[3] = max(above[3], box[3])
+                above[0] = min(above[0], box[0])
+                next_open[(first, last)] = above
+            else:
+                rects.append((first, last, box))
+                next_open[(first, last)] = box
+        open_rects = next_open
+
+    return [tuple(box) for _, _, box in rects]
+
+
+def encode_block(img: Image.Image, compress: bool) -> bytes:
+    data = img.tobytes("raw", "BGRA")
+    return zlib.compress(data, 9) if compress else data
+
+
+class CompressedSizes:
+    """
+    What images add to a compressed pack. Small patches compress far worse
+    than whole frames and an image already stored costs nothing again, so
+    for compressed packs deltas are weighed by these bytes, not by area.
+    """
+
+    def __init__(self):
+        self.sizes: dict[str, int] = {}
+        self.stored: set[str] = set()
+
+    def cost(self, images: dict[str, Image.Image]) -> int:
+        total = 0
+        for key, img in images.items():
+            if key in self.stored:
+                continue
+            if key not in self.sizes:
+                self.sizes[key] = len(encode_block(img, compress=True)) + IMAGE_OVERHEAD
+            total += self.sizes[key]
+        return total
+
+    def store(self, keys):
+        self.stored.update(keys)
+
+
+def encode_steps(
+    anim: Animation,
+    pool: dict[str, Image.Image],
+    delta: bool,
+    sizes: CompressedSizes | None = None,
+) -> list[dict]:
+    """
+    Frame entries for one animation. The first frame is always a keyframe
+    (a pool image at an offset). With delta=True later frames store only
+    the canvas rectangles that changed since the previous frame, as new
+    pool images, unless that would not be smaller than a keyframe: by
+    area, or by compressed bytes when sizes is given.
+    """
+    entries: list[dict] = []
+    prev: Image.Image | None = None
+    for step in anim.steps:
+        img = pool[step.key]
+        cur = canvas_image(img, step.offset, anim.canvas) if delta else None
+
+        patches = None
+        if prev is not None:
+            rects = changed_rects(prev, cur)
+            crops = [(image_hash(patch), patch, r) for r, patch in ((r, cur.crop(r)) for r in rects)]
+            if sizes is not None:
+                smaller = sizes.cost({key: patch for key, patch, _ in crops}) < sizes.cost({step.key: img})
+            else:
+                area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+                smaller = area < img.width * img.height * DELTA_MAX_AREA
+            if smaller:
+                patches = []
+                for key, patch, r in crops:
+                    pool.setdefault(key, patch)
+                    patches.append((key, r[0], r[1]))
+
+        if sizes is not None:
+            sizes.store([step.key] if patches is None else [key for key, _, _ in patches])
+        if patches is None:
+            entries.append({
+                "image": step.key, "offset": list(step.offset),
+                "ticks": step.ticks, "mask": mask_bands(img),
+            })
+        else:
+            entries.append({"patches": patches, "ticks": step.ticks, "mask": mask_bands(cur)})
+        prev = cur
+
+    return entries
+
+
+def sheet_patches(entries: list[dict], pool: dict[str, Image.Image]) -> None:
+    """
+    Move every patch of one animation's delta frames onto a single pool
+    image, so the loader holds one pixmap for them rather than one per
+    rectangle. Patches become [sheet, sx, sy, w, h, x, y].
+    """
+    keys = list(dict.fromkeys(key for e in entries for key, _, _ in e.get("patches", ())))
+    if not keys:
+        return
+    positions, sheet_w, sheet_h = shelf_pack([pool[key].size for key in keys])
+    sheet = Image.new("RGBA", (sheet_w, sheet_h), (0, 0, 0, 0))
+    for key, pos in zip(keys, positions):
+        sheet.paste(pool[key], pos)
+    sheet_key = image_hash(sheet)
+    pool[sheet_key] = sheet
+
+    at = dict(zip(keys, positions))
+    for e in entries:
+        if "patches" in e:
+            e["patches"] = [(sheet_key, *at[key], *pool[key].size, x, y) for key, x, y in e["patches"]]
+
+
+def build_pack(
+    sprites_dir: Path,
+    out_path: Path,
+    compress: bool = False,
+    delta: bool = True,
+    verbose: bool = True,
+) -> None:
+    """
+    Write every animation under sprites_dir into a single pack file.
+    Frames are trimmed and deduplicated the same way pack_atlas.py does,
+    and (with delta=True) stored as keyframes plus changed rectangles,
+    which are gathered onto one image per animation.
+    """
+    anims, pool, _ = collect(sprites_dir)
+    sizes = CompressedSizes() if compress and delta else None
+    entries = {anim.name: encode_steps(anim, pool, delta, sizes) for anim in anims.values()}
+    for steps in entries.values():
+        sheet_patches(steps, pool)
+
+    # Only images some frame still refers to end up in the file
+    used: dict[str, None] = {}
+    for steps in entries.values():
+        for e in steps:
+            if "image" in e:
+                used[e["image"]] = None
+            for key, *_ in e.get("patches", ()):
+                used[key] = None
+    keys = list(used)
+
+    blocks: list[bytes] = []
+    images: list[dict] = []
+    for key in keys:
+        img = pool[key]
+        data = encode_block(img, compress)
+        codec = "zlib" if compress else "raw"
+        blocks.append(data)
+        images.append({"size": list(img.size), "codec": codec, "length": len(data)})
+
+    # Block offsets are relative to the first block, which starts on the
+    # first aligned boundary after the index
+    pos = 0
+    for entry, data in zip(images, blocks):
+        entry["offset"] = pos
+        pos = align(pos + len(data))
+
+    index_of = {key: i for i, key in enumerate(keys)}
+    for steps in entries.values():
+        for e in steps:
+            if "image" in e:
+                e["image"] = index_of[e["image"]]
+            if "patches" in e:
+                e["patches"] = [[index_of[key], *rest] for key, *rest in e["patches"]]
+
+    index = {
+        "images": images,
+        "anims": {
+            anim.name: {"canvas": list(anim.canvas), "frames": entries[anim.name]}
+            for anim in anims.values()
+        },
+    }
+    raw_index = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    data_start = align(HEADER.size + len(raw_index))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, PACK_VERSION, len(raw_index)))
+        f.write(raw_index)
+        for entry, data in zip(images, blocks):
+            f.write(b"\0" * (data_start + entry["offset"] - f.tell()))
+            f.write(data)
+    tmp.replace(out_path)
+
+    if verbose:
+        frames = sum(anim.frame_count for anim in anims.values())
+        deltas = sum("patches" in e for steps in entries.values() for e in steps)
+        print(f"{len(anims)} animation(s), {frames} frame(s), {deltas} delta frame(s), "
+              f"{len(images)} image(s)")
+        print(f"{out_path}: {out_path.stat().st_size // 1024} KB")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the single-file animation pack.")
+    parser.add_argument("sprites_dir", nargs="?", type=Path, default=Path("assets/sprites"))
+    parser.add_argument("out_path", nargs="?", type=Path, default=Path("assets/sprites.pack"))
+    parser.add_argument("-z", "--compress", action="store_true",
+                        help="zlib-compress pixel blocks (smaller file, decoded on load)")
+    parser.add_argument("--keyframes-only", action="store_true",
+                        help="store every frame whole instead of as changed rectangles")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    build_pack(
+        args.sprites_dir, args.out_path,
+        compress=args.compress, delta=not args.keyframes_only, verbose=not args.quiet,
+    )
+    print("done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
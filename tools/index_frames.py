@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from pathlib import Path
+from PIL import Image
+import argparse
+import sys
+
+# PNG palettes hold at most this many colours
+MAX_COLORS = 256
+
+
+def normalized(img: Image.Image) -> Image.Image:
+    """
+    img as RGBA with every fully transparent pixel set to (0, 0, 0, 0).
+    Their colour never shows (frames are drawn premultiplied), and keeping
+    it would waste palette entries.
+    """
+    img = img.convert("RGBA")
+    alpha = img.getchannel("A")
+    if alpha.getextrema()[0] == 0:
+        clear = Image.new("RGBA", img.size, (0, 0, 0, 0))
+        img = Image.composite(img, clear, alpha.point(lambda a: 255 if a else 0))
+    return img
+
+
+def colors(img: Image.Image) -> set[tuple[int, int, int, int]] | None:
+    """The RGBA colours of img, or None if there are more than a palette holds."""
+    found = img.getcolors(MAX_COLORS)
+    return None if found is None else {c for _, c in found}
+
+
+def make_palette(used: set[tuple[int, int, int, int]]) -> list[tuple[int, int, int, int]]:
+    # Translucent entries first, so the tRNS chunk can stop at the last of them
+    return sorted(used, key=lambda c: (c[3] == 255, c))
+
+
+def to_indexed(img: Image.Image, palette: list[tuple[int, int, int, int]]) -> Image.Image:
+    """img as a "P" image with an RGBA palette; every colour must be in palette."""
+    index = {c: i for i, c in enumerate(palette)}
+    pixels = img.tobytes()
+    indices = bytes(index[tuple(pixels[i:i + 4])] for i in range(0, len(pixels), 4))
+    out = Image.frombytes("P", img.size, indices)
+    out.putpalette(b"".join(bytes(c) for c in palette), rawmode="RGBA")
+    return out
+
+
+def folder_colors(folder: Path) -> set[tuple[int, int, int, int]] | None:
+    """All colours used in folder's PNGs, or None if they do not fit one palette."""
+    union: set[tuple[int, int, int, int]] = set()
+    for p in sorted(folder.glob("*.png")):
+        used = colors(normalized(Image.open(p)))
+        if used is None:
+            return None
+        union |= used
+        if len(union) > MAX_COLORS:
+            return None
+    return union
+
+
+def index_folder(
+    folder: Path,
+    out_dir: Path,
+    palette: list[tuple[int, int, int, int]] | None = None,
+) -> tuple[int, int, dict[str, int]]:
+    """
+    Rewrite every PNG in folder to out_dir as an indexed PNG with a tRNS
+    alpha table, when that is lossless. Frames use palette if given (one
+    shared by every animation keeps identical frames byte-identical, so
+    the loader still decodes them once), else one for the whole folder if
+    its colours fit, else one each. A frame with too many colours, or that
+    does not read back pixel for pixel, is written as RGBA.
+    Returns (bytes before, bytes after, count of frames per kind).
+    """
+    paths = sorted(folder.glob("*.png"))
+    if not paths:
+        return 0, 0, {}
+
+    frames = [(p, normalized(Image.open(p))) for p in paths]
+    per_frame = [colors(img) for _, img in frames]
+
+    shared = palette
+    if shared is None and all(c is not None for c in per_frame):
+        union = set().union(*per_frame)
+        if len(union) <= MAX_COLORS:
+            shared = make_palette(union)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    before = after = 0
+    kinds = {"shared": 0, "own": 0, "rgba": 0}
+    in_shared = set(shared) if shared is not None else set()
+    for (p, img), used in zip(frames, per_frame):
+        before += p.stat().st_size
+        out = out_dir / p.name
+
+        kind = "rgba"
+        if used is not None and (shared is None or used <= in_shared):
+            indexed = to_indexed(img, shared if shared is not None else make_palette(used))
+            indexed.save(out, optimize=True)
+            if Image.open(out).convert("RGBA").tobytes() == img.tobytes():
+                kind = "shared" if shared is not None else "own"
+        if kind == "rgba":
+            img.save(out, optimize=True)
+
+        kinds[kind] += 1
+        after += out.stat().st_size
+
+    # frames.json, order.txt and anything else that isn't a frame travels along
+    if out_dir != folder:
+        for extra in folder.iterdir():
+            if extra.is_file() and extra.suffix != ".png":
+                (out_dir / extra.name).write_bytes(extra.read_bytes())
+
+    return before, after, kinds
+
+
+def index_all(sprites_dir: Path, out_dir: Path, verbose: bool = True) -> None:
+    """
+    Index each animation folder under sprites_dir (in place if out_dir is
+    the same folder), with one palette for all of them when their colours
+    fit in it.
+    """
+    if not sprites_dir.exists():
+        raise FileNotFoundError(f"Sprites folder does not exist: {sprites_dir}")
+
+    folders = sorted(p for p in sprites_dir.iterdir() if p.is_dir())
+    union: set[tuple[int, int, int, int]] | None = set()
+    for folder in folders:
+        used = folder_colors(folder)
+        union = union | used if union is not None and used is not None else None
+        if union is not None and len(union) > MAX_COLORS:
+            union = None
+    palette = make_palette(union) if union else None
+    if verbose and palette:
+        print(f"one palette of {len(palette)} colours for every animation")
+
+    total_before = total_after = 0
+    for folder in folders:
+        before, after, kinds = index_folder(folder, out_dir / folder.name, palette)
+        total_before += before
+        total_after += after
+        if verbose and before:
+            summary = ", ".join(f"{n} {kind}" for kind, n in kinds.items() if n)
+            print(f"{folder.name}: {before // 1024} KB -> {after // 1024} KB ({summary})")
+    if verbose:
+        print(f"total: {total_before // 1024} KB -> {total_after // 1024} KB")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Rewrite animation frames as palette-indexed PNGs where lossless.")
+    parser.add_argument("sprites_dir", nargs="?", type=Path, default=Path("assets/sprites"))
+    parser.add_argument("out_dir", nargs="?", type=Path,
+                        help="where to write indexed folders (default: in place)")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    index_all(args.sprites_dir, args.out_dir or args.sprites_dir, verbose=not args.quiet)
+    print("done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from PIL import Image
+import argparse
+import hashlib
+import json
+import math
+import sys
+
+from trim_frames import load_table, mask_bands, placement, trim
+
+PADDING = 1           # transparent gutter between packed frames
+ATLAS_VERSION = 2
+
+
+def frame_paths(folder: Path) -> list[Path]:
+    """
+    Frame files for one animation folder, honouring order.txt the same
+    way sprites.frame_paths does.
+    """
+    order_file = folder / "order.txt"
+    if not order_file.exists():
+        return sorted(folder.glob("*.png"))
+
+    paths: list[Path] = []
+    for line in order_file.read_text(encoding="utf-8").splitlines():
+        name = line.strip()
+        if not name or name.startswith("#"):
+            continue
+        p = folder / name
+        if p.exists():
+            paths.append(p)
+    return paths
+
+
+def shelf_pack(sizes: list[tuple[int, int]]) -> tuple[list[tuple[int, int]], int, int]:
+    """
+    Place rectangles on horizontal shelves, tallest first.
+    Returns the top-left of each rect (in input order) and the sheet size.
+    """
+    if not sizes:
+        return [], 1, 1
+
+    area = sum((w + PADDING) * (h + PADDING) for w, h in sizes)
+    sheet_w = max(max(w for w, _ in sizes), math.ceil(math.sqrt(area) * 1.1))
+
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions: list[tuple[int, int]] = [(0, 0)] * len(sizes)
+
+    x = y = shelf_h = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > sheet_w:
+            x = 0
+            y += shelf_h + PADDING
+            shelf_h = 0
+        positions[i] = (x, y)
+        x += w + PADDING
+        shelf_h = max(shelf_h, h)
+
+    sheet_h = y + shelf_h
+    return positions, sheet_w, sheet_h
+
+
+def load_animation(folder: Path) -> tuple[list[tuple[Path, Image.Image, tuple[int, int]]], tuple[int, int]]:
+    """
+    Trimmed frames of one animation folder as (path, image, offset), plus
+    the canvas size. Folders already run through trim_frames.py keep their
+    recorded canvas.
+    """
+    table = load_table(folder)
+
+    frames: list[tuple[Path, Image.Image, tuple[int, int]]] = []
+    canvas_w = canvas_h = 1
+    for p in frame_paths(folder):
+        img = Image.open(p).convert("RGBA")
+        (ox, oy), (cw, ch) = placement(table, p, img)
+        cropped, (dx, dy) = trim(img)
+        frames.append((p, cropped, (ox + dx, oy + dy)))
+        canvas_w = max(canvas_w, cw)
+        canvas_h = max(canvas_h, ch)
+
+    return frames, (canvas_w, canvas_h)
+
+
+def image_hash(img: Image.Image) -> str:
+    h = hashlib.sha1(f"{img.width}x{img.height}".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+@dataclass
+class Step:
+    """
+    One entry of an animation's sequence: an image held for one or more
+    source frames. Tables store that count as "ticks"; how long a tick
+    lasts is up to the player (Buddy.anim_speeds), so it is not baked in.
+    """
+    key: str                  # image_hash of the trimmed image
+    offset: tuple[int, int]
+    files: list[str] = field(default_factory=list)
+
+    @property
+    def ticks(self) -> int:
+        return len(self.files)
+
+
+@dataclass
+class Animation:
+    name: str
+    canvas: tuple[int, int]
+    steps: list[Step]
+    frame_count: int
+
+
+def collect(sprites_dir: Path) -> tuple[dict[str, Animation], dict[str, Image.Image], dict[str, str]]:
+    """
+    Load and trim every animation folder under sprites_dir.
+
+    Returns the animations (in name order), the pool of unique images by
+    hash, and which animation first used each image. Runs of the same
+    image at the same offset collapse into one held Step.
+    """
+    if not sprites_dir.exists():
+        raise FileNotFoundError(f"Sprites folder does not exist: {sprites_dir}")
+
+    anims: dict[str, Animation] = {}
+    pool: dict[str, Image.Image] = {}
+    owner: dict[str, str] = {}
+
+    for folder in sorted(p for p in sprites_dir.iterdir() if p.is_dir()):
+        frames, canvas = load_animation(folder)
+        if not frames:
+            continue
+
+        name = folder.name
+        steps: list[Step] = []
+        for p, img, offset in frames:
+            key = image_hash(img)
+            if key not in pool:
+                pool[key] = img
+                owner[key] = name
+
+            prev = steps[-1] if steps else None
+            if prev is not None and prev.key == key and prev.offset == offset:
+                # Same picture held for another tick
+                prev.files.append(p.name)
+                continue
+            steps.append(Step(key, offset, [p.name]))
+
+        anims[name] = Animation(name, canvas, steps, len(frames))
+
+    return anims, pool, owner
+
+
+def pack_all(sprites_dir: Path, out_dir: Path, verbose: bool = True) -> None:
+    """
+    Pack every animation folder under sprites_dir into out_dir.
+
+    Pixel-identical frames are stored once: each unique image lives on the
+    sheet of the first animation (in name order) that uses it, and every
+    animation's table points into whichever sheets it needs.
+    """
+    anims, pool, owner = collect(sprites_dir)
+
+    # One sheet per animation that introduced new images
+    rects: dict[str, tuple[int, int, int, int]] = {}
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in anims:
+        keys = [key for key in pool if owner[key] == name]
+        sheet_file = out_dir / f"{name}.png"
+        if not keys:
+            sheet_file.unlink(missing_ok=True)
+            continue
+        positions, sheet_w, sheet_h = shelf_pack([pool[key].size for key in keys])
+        sheet = Image.new("RGBA", (sheet_w, sheet_h), (0, 0, 0, 0))
+        for key, pos in zip(keys, positions):
+            sheet.paste(pool[key], pos)
+            rects[key] = (pos[0], pos[1], *pool[key].size)
+        sheet.save(sheet_file, optimize=True)
+
+    for anim in anims.values():
+        table = frame_table(anim, pool, owner, rects)
+        (out_dir / f"{anim.name}.json").write_text(json.dumps(table, indent=1), encoding="utf-8")
+        if verbose:
+            print(f"{anim.name}: {anim.frame_count} frame(s) -> {len(table['sprites'])} sprite(s), "
+                  f"{len(table['frames'])} step(s), sheets {table['sheets']}")
+
+    if verbose:
+        total = sum(anim.frame_count for anim in anims.values())
+        print(f"{total} frame(s), {len(pool)} unique image(s)")
+
+
+def frame_table(
+    anim: Animation,
+    pool: dict[str, Image.Image],
+    owner: dict[str, str],
+    rects: dict[str, tuple[int, int, int, int]],
+) -> dict:
+    sheets: list[str] = []
+    sprites: list[list[int]] = []
+    masks: list[str] = []
+    sprite_ids: dict[str, int] = {}
+
+    frames: list[dict] = []
+    for step in anim.steps:
+        if step.key not in sprite_ids:
+            sheet = f"{owner[step.key]}.png"
+            if sheet not in sheets:
+                sheets.append(sheet)
+            sprite_ids[step.key] = len(sprites)
+            sprites.append([sheets.index(sheet), *rects[step.key]])
+            masks.append(mask_bands(pool[step.key]))
+
+        frames.append({
+            "sprite": sprite_ids[step.key],
+            "offset": list(step.offset),
+            "ticks": step.ticks,
+            "files": step.files,
+        })
+
+    return {
+        "version": ATLAS_VERSION,
+        "canvas": list(anim.canvas),
+        "sheets": sheets,
+        "sprites": sprites,
+        "masks": masks,
+        "frames": frames,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Pack animation folders into texture atlases.")
+    parser.add_argument("sprites_dir", nargs="?", type=Path, default=Path("assets/sprites"))
+    parser.add_argument("out_dir", nargs="?", type=Path, default=Path("assets/atlas"))
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    pack_all(args.sprites_dir, args.out_dir, verbose=not args.quiet)
+    print("done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
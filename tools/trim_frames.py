@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from pathlib import Path
+from PIL import Image
+import argparse
+import json
+import re
+import sys
+
+# Per-folder table of canvas size, trim offsets and hit-test masks, read by sprites.py
+TABLE_NAME = "frames.json"
+TABLE_VERSION = 1
+
+
+def trim(img: Image.Image) -> tuple[Image.Image, tuple[int, int]]:
+    """
+    Crop img to its alpha bounding box.
+    Returns the cropped image and its offset inside the original canvas.
+    Fully transparent frames become a single transparent pixel.
+    """
+    bbox = img.getchannel("A").getbbox()
+    if bbox is None:
+        return img.crop((0, 0, 1, 1)), (0, 0)
+    return img.crop(bbox), (bbox[0], bbox[1])
+
+
+def mask_bands(img: Image.Image) -> str:
+    """
+    Hit-test mask of img covering every pixel with alpha > 0, as
+    "top,bottom,x0,x1,x0,x1,...;..." bands of half-open spans. Consecutive
+    rows with the same spans share one band, so each band maps straight
+    onto the y-x banded rectangles a QRegion is made of.
+    """
+    alpha = img.getchannel("A").tobytes()
+    w, h = img.size
+
+    bands: list[list[int]] = []
+    prev: list[int] | None = None
+    for y in range(h):
+        spans = [x for m in re.finditer(rb"[^\x00]+", alpha[y * w:(y + 1) * w]) for x in m.span()]
+        if spans and spans == prev:
+            bands[-1][1] = y + 1
+        elif spans:
+            bands.append([y, y + 1, *spans])
+        prev = spans
+    return ";".join(",".join(map(str, band)) for band in bands)
+
+
+def load_table(folder: Path) -> dict | None:
+    """
+    The trim table of an already-trimmed folder, or None for full frames.
+    """
+    try:
+        table = json.loads((folder / TABLE_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if table.get("version") != TABLE_VERSION:
+        return None
+    return table
+
+
+def placement(table: dict | None, path: Path, img: Image.Image) -> tuple[tuple[int, int], tuple[int, int]]:
+    """
+    (offset, canvas size) of a frame file, honouring an existing trim table.
+    """
+    if table is not None:
+        entry = table["frames"].get(path.name)
+        if entry is not None:
+            return tuple(entry["offset"]), tuple(table["canvas"])
+    return (0, 0), img.size
+
+
+def trim_folder(folder: Path, out_dir: Path) -> tuple[int, int]:
+    """
+    Crop every PNG in folder to its alpha bounding box, write it to out_dir
+    and record the offsets and hit-test masks in out_dir/frames.json.
+    Running it again on an already-trimmed folder keeps the original canvas
+    and offsets.
+    Returns (bytes of pixels before, bytes after).
+    """
+    paths = sorted(folder.glob("*.png"))
+    if not paths:
+        return 0, 0
+
+    before = after = 0
+    canvas_w = canvas_h = 1
+    entries: dict[str, dict] = {}
+    trimmed: list[tuple[Path, Image.Image]] = []
+    table = load_table(folder)
+
+    for p in paths:
+        img = Image.open(p).convert("RGBA")
+        (ox, oy), (cw, ch) = placement(table, p, img)
+        cropped, (dx, dy) = trim(img)
+
+        canvas_w = max(canvas_w, cw)
+        canvas_h = max(canvas_h, ch)
+        entries[p.name] = {"offset": [ox + dx, oy + dy], "mask": mask_bands(cropped)}
+        trimmed.append((p, cropped))
+
+        before += cw * ch * 4
+        after += cropped.width * cropped.height * 4
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for p, cropped in trimmed:
+        cropped.save(out_dir / p.name)
+
+    # order.txt and anything else that isn't a frame travels along
+    if out_dir != folder:
+        for extra in folder.iterdir():
+            if extra.is_file() and extra.suffix != ".png" and extra.name != TABLE_NAME:
+                (out_dir / extra.name).write_bytes(extra.read_bytes())
+
+    table = {"version": TABLE_VERSION, "canvas": [canvas_w, canvas_h], "frames": entries}
+    (out_dir / TABLE_NAME).write_text(json.dumps(table, indent=1), encoding="utf-8")
+    return before, after
+
+
+def trim_all(sprites_dir: Path, out_dir: Path, verbose: bool = True) -> None:
+    """
+    Trim each animation folder under sprites_dir (in place if out_dir is
+    the same folder).
+    """
+    if not sprites_dir.exists():
+        raise FileNotFoundError(f"Sprites folder does not exist: {sprites_dir}")
+
+    for folder in sorted(p for p in sprites_dir.iterdir() if p.is_dir()):
+        before, after = trim_folder(folder, out_dir / folder.name)
+        if verbose and before:
+            print(f"{folder.name}: {before // 1024} KB -> {after // 1024} KB decoded")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Crop animation frames to their alpha bounds.")
+    parser.add_argument("sprites_dir", nargs="?", type=Path, default=Path("assets/sprites"))
+    parser.add_argument("out_dir", nargs="?", type=Path,
+                        help="where to write trimmed folders (default: in place)")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    trim_all(args.sprites_dir, args.out_dir or args.sprites_dir, verbose=not args.quiet)
+    print("done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())